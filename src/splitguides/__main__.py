@@ -1,10 +1,18 @@
 import sys
-from PySide6.QtWidgets import QApplication
 
-from splitguides.ui.main_window import MainWindow
+from splitguides import tracing
 
 
 def main() -> int:
+    if sys.argv[1:2] == ["compile"]:
+        # Compiling notes doesn't need Qt
+        from splitguides.compiler import main as compile_main
+        return compile_main(sys.argv[2:])
+
+    from PySide6.QtWidgets import QApplication
+    from splitguides.ui.main_window import MainWindow
+
+    tracing.enable_from_environment()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
@@ -0,0 +1,202 @@
+"""
+Prepare the images and videos used by notes before they are shown.
+
+Small local images are inlined into the rendered HTML as data URIs so they
+display in the same frame as the notes, without a separate fetch and decode.
+Larger images and videos in the upcoming splits can be preloaded by the
+browser, or read ahead of time for the desktop view.
+"""
+import base64
+import html
+import mimetypes
+import re
+import threading
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+# Images up to this size in bytes are inlined, 0 to disable inlining
+INLINE_LIMIT = 32 * 1024
+# Limit on the inlined data in one page, QWebEngineView.setHtml can't show
+# pages over 2MB once they are percent encoded
+INLINE_PAGE_LIMIT = 1024 * 1024
+# Number of splits after those shown to preload assets for
+PRELOAD_SPLITS = 2
+
+# Matches the src attribute of media elements in sanitised HTML
+media_pattern = re.compile(r"""(<(img|video|source)\b[^>]*?\bsrc=")([^"]*)(")""")
+# Matches image links in markdown and src attributes in raw notes
+raw_asset_pattern = re.compile(r"""!\[[^\]]*\]\(\s*<?([^)\s>]+)|\bsrc=["']([^"']+)["']""")
+
+
+def is_local(url: str) -> bool:
+    parts = urlsplit(url)
+    return not (parts.scheme or parts.netloc or url.startswith(("/", "#")))
+
+
+def find_media(rendered: str) -> list[tuple[str, str]]:
+    """
+    Get the local media referenced by rendered HTML
+
+    :param rendered: sanitised HTML
+    :return: list of (tag, url) in order of appearance
+    """
+    result = []
+    for _, tag, url, _ in media_pattern.findall(rendered):
+        url = html.unescape(url)
+        if is_local(url):
+            result.append((tag, url))
+    return result
+
+
+def preload_links(rendered_splits: list[str]) -> str:
+    """
+    Get link tags asking the browser to fetch the media used in upcoming splits
+
+    :param rendered_splits: processed HTML of the upcoming splits
+    :return: HTML link tags
+    """
+    links = {}
+    for rendered in rendered_splits:
+        for tag, url in find_media(rendered):
+            href = html.escape(url)
+            if tag == "img":
+                links.setdefault(url, f'<link rel="preload" as="image" href="{href}">')
+            else:
+                # Browsers don't support preloading video, prefetch caches the file
+                links.setdefault(url, f'<link rel="prefetch" href="{href}">')
+    return "".join(links.values())
+
+
+class AssetPipeline:
+    """
+    Inline small images and read ahead the assets for a notes file
+    """
+
+    def __init__(
+        self,
+        folder,
+        inline_limit: int = INLINE_LIMIT,
+        page_limit: int = INLINE_PAGE_LIMIT,
+    ):
+        """
+        :param folder: folder relative asset paths are found in, usually the notes folder
+        :param inline_limit: largest image in bytes to inline, 0 to disable
+        :param page_limit: most inlined data in one call to process, images after
+                           this is used up are left as links
+        """
+        self.folder = Path(folder).resolve()
+        self.inline_limit = inline_limit
+        self.page_limit = page_limit
+        self.lock = threading.Lock()
+        # path -> (modification time or None if missing,
+        #          data uri or None if it can't be inlined)
+        self.cache: dict[Path, tuple[int | None, str | None]] = {}
+
+    @staticmethod
+    def get_mtime(path: Path) -> int | None:
+        try:
+            return path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def resolve(self, url: str) -> Path | None:
+        """
+        Get the path of a relative url, None if it is outside the notes folder
+        """
+        path = (self.folder / unquote(urlsplit(url).path)).resolve()
+        if not path.is_relative_to(self.folder):
+            return None
+        return path
+
+    def get_data_uri(self, url: str) -> str | None:
+        """
+        Get a data URI for an image, reading the file if it has changed
+
+        :param url: url relative to the asset folder
+        :return: data URI or None if the file is missing, too large or not an image
+        """
+        if not self.inline_limit:
+            return None
+
+        path = self.resolve(url)
+        if path is None:
+            return None
+
+        try:
+            stat = path.stat()
+        except OSError:
+            # Remembered so the image is shown if it is added later
+            with self.lock:
+                self.cache[path] = (None, None)
+            return None
+
+        with self.lock:
+            cached = self.cache.get(path)
+        if cached and cached[0] == stat.st_mtime_ns:
+            return cached[1]
+
+        data_uri = None
+        mimetype, _ = mimetypes.guess_type(path.name)
+        if mimetype and mimetype.startswith("image/") and stat.st_size <= self.inline_limit:
+            try:
+                data = path.read_bytes()
+            except OSError:
+                return None
+            data_uri = f"data:{mimetype};base64,{base64.b64encode(data).decode('ascii')}"
+
+        with self.lock:
+            self.cache[path] = (stat.st_mtime_ns, data_uri)
+        return data_uri
+
+    def process(self, splits: list[str]) -> list[str]:
+        """
+        Replace small local images in rendered splits with inline data,
+        until page_limit bytes have been inlined.
+
+        :param splits: sanitised HTML for the splits shown together
+        :return: HTML for each split with images inlined
+        """
+        remaining = self.page_limit
+
+        def replace(match):
+            nonlocal remaining
+            prefix, tag, url, suffix = match.groups()
+            if tag == "img":
+                url = html.unescape(url)
+                if is_local(url) and (data_uri := self.get_data_uri(url)):
+                    if len(data_uri) <= remaining:
+                        remaining -= len(data_uri)
+                        return f"{prefix}{data_uri}{suffix}"
+            return match.group(0)
+
+        return [media_pattern.sub(replace, split) for split in splits]
+
+    def check_for_changes(self) -> bool:
+        """
+        Check if any image read so far has been changed, added or removed
+
+        :return: True if any have changed, they are read again when next used
+        """
+        with self.lock:
+            cached = list(self.cache.items())
+
+        changed = [
+            path for path, (mtime, _) in cached if self.get_mtime(path) != mtime
+        ]
+        if changed:
+            with self.lock:
+                for path in changed:
+                    self.cache.pop(path, None)
+        return bool(changed)
+
+    def warm(self, raw_splits: list[str]) -> None:
+        """
+        Read the images used by upcoming splits so they are ready to be inlined
+
+        :param raw_splits: unrendered text of the upcoming splits
+        """
+        for raw in raw_splits:
+            for match in raw_asset_pattern.finditer(raw):
+                url = match.group(1) or match.group(2)
+                if is_local(url):
+                    self.get_data_uri(url)
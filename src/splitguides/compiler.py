@@ -0,0 +1,175 @@
+"""
+Compile notes into a bundle that loads without parsing or markdown rendering.
+
+A bundle is a JSON lines file. The first line is a header describing the
+notes, each following line is one split with its source line range, raw
+text, hash and rendered HTML.
+
+Usage: splitguides compile notes.md [-o notes.sgnotes] [--separator SEP]
+"""
+import argparse
+import hashlib
+import json
+import re
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from .assets import is_local
+from .exceptions import NotesBundleError
+from .note_parser import BUNDLE_SUFFIX, Notes, SplitIndex
+
+BUNDLE_FORMAT = "splitguides-notes"
+BUNDLE_VERSION = 1
+
+asset_pattern = re.compile(r"""\b(?:src|href)=["']([^"']+)["']""")
+
+
+def find_assets(html: str) -> list[str]:
+    """
+    Get the local files referenced by rendered notes, in order of first use
+
+    :param html: rendered split HTML
+    :return: relative paths of images, videos and links
+    """
+    assets = []
+    for url in asset_pattern.findall(html):
+        if not is_local(url):
+            continue
+        path = urlsplit(url).path
+        if path and path not in assets:
+            assets.append(path)
+    return assets
+
+
+def compile_notes(path, output=None, separator: str = "") -> Path:
+    """
+    Parse and render a notes file and write it as a bundle
+
+    :param path: path to the notes file
+    :param output: path for the bundle, default is the notes path with the bundle suffix
+    :param separator: the separator between split segments (default blank line)
+    :return: path of the bundle written
+    """
+    path = Path(path)
+    output = Path(output) if output else path.with_suffix(BUNDLE_SUFFIX)
+
+    source = path.read_bytes()
+    notes = Notes.from_file(path, separator)
+    rendered = [
+        notes.render_splits(idx, idx + 1)[0] for idx in range(len(notes.index))
+    ]
+
+    assets = []
+    for html in rendered:
+        assets.extend(asset for asset in find_assets(html) if asset not in assets)
+
+    header = {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "source": path.name,
+        "source_hash": hashlib.sha256(source).hexdigest(),
+        "separator": separator,
+        "split_count": len(rendered),
+        "split_names": notes.split_names,
+        "assets": assets,
+    }
+
+    index = notes.index
+    with open(output, "w", encoding="utf-8") as f:
+        f.write(json.dumps(header) + "\n")
+        for idx, (text, html) in enumerate(zip(notes.notes, rendered)):
+            split = {
+                "start": index.starts[idx],
+                "end": index.ends[idx],
+                "lines": index.line_counts[idx],
+                "hash": index.hashes[idx],
+                "text": text,
+                "html": html,
+            }
+            f.write(json.dumps(split) + "\n")
+
+    return output
+
+
+def load_bundle(path) -> Notes:
+    """
+    Create Notes from a compiled bundle without parsing or rendering the text
+
+    :param path: path to the bundle
+    :return: Notes with the rendered HTML from the bundle
+    :raises NotesBundleError: if the file is not a bundle this version can read
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            header = json.loads(f.readline())
+        except json.JSONDecodeError as e:
+            raise NotesBundleError(f"{path} is not a SplitGuides notes bundle") from e
+
+        if not isinstance(header, dict) or header.get("format") != BUNDLE_FORMAT:
+            raise NotesBundleError(f"{path} is not a SplitGuides notes bundle")
+        if header.get("version") != BUNDLE_VERSION:
+            raise NotesBundleError(
+                f"{path} is bundle version {header.get('version')}, "
+                f"only version {BUNDLE_VERSION} is supported"
+            )
+
+        try:
+            splits = [json.loads(line) for line in f if line.strip()]
+
+            if len(splits) != header["split_count"]:
+                raise NotesBundleError(
+                    f"{path} should contain {header['split_count']} splits "
+                    f"but contains {len(splits)}"
+                )
+
+            index = SplitIndex()
+            for split in splits:
+                index.append(
+                    split["text"],
+                    split["start"],
+                    split["end"],
+                    split["lines"],
+                    split["hash"],
+                )
+
+            notes = Notes([], header["separator"])
+            notes.notes = [split["text"] for split in splits]
+            notes.split_names = header["split_names"]
+            notes.index = index
+            notes.rendered = [split["html"] for split in splits]
+            notes.source_hash = header["source_hash"]
+            notes.assets = header["assets"]
+        except (KeyError, TypeError, OverflowError, json.JSONDecodeError) as e:
+            raise NotesBundleError(f"{path} is not a valid notes bundle: {e!r}") from e
+
+    return notes
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="splitguides compile",
+        description="Compile a notes file into a bundle that loads without rendering.",
+    )
+    parser.add_argument("notes", help="Notes file to compile")
+    parser.add_argument(
+        "-o", "--output", help=f"Bundle file to write (default: <notes>{BUNDLE_SUFFIX})"
+    )
+    parser.add_argument(
+        "--separator",
+        default="",
+        help="Split separator used in the notes (default: blank line)",
+    )
+    return parser
+
+
+def main(argv=None) -> int:
+    args = get_parser().parse_args(argv)
+
+    notes_path = Path(args.notes)
+    if not notes_path.is_file():
+        print(f"Notes file '{notes_path}' not found.")
+        return 1
+
+    output = compile_notes(notes_path, args.output, args.separator)
+    print(f"Compiled '{notes_path}' to '{output}'")
+    return 0
@@ -2,3 +2,9 @@ class UnsupportedPlatformError(Exception):
     """
     Error for project not running on Windows or Linux.
     """
+
+
+class NotesBundleError(ValueError):
+    """
+    Error for a compiled notes bundle that can't be read.
+    """
@@ -7,7 +7,6 @@ This is a rewrite of the relevant functions to handle this.
 import queue as _queue
 
 from ducktools.classbuilder.prefab import prefab, attribute, SlotFields
-import keyboard
 
 
 KEY_DOWN = "down"
@@ -34,6 +33,9 @@ def read_hotkey(suppress: bool = True) -> Hotkey:
     """
     # This function is only ever called in windows
 
+    # keyboard is imported here so settings can be loaded without it (server)
+    import keyboard
+
     queue = _queue.Queue()
 
     # Replace lambda with
@@ -0,0 +1,121 @@
+"""
+Measure the time from livesplit reporting a new split to the notes being shown.
+
+Measurement is off unless the environment variable SPLITGUIDES_LATENCY is set.
+Times are taken with time.perf_counter from the moment the SplitWatcher
+reports the change to each later stage (render, display, etc).
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+
+LATENCY_ENV = "SPLITGUIDES_LATENCY"
+MAX_SAMPLES = 10_000
+
+
+def latency_enabled() -> bool:
+    return bool(os.environ.get(LATENCY_ENV))
+
+
+def percentile(sorted_samples: list[float], pct: float) -> float:
+    """
+    Nearest rank percentile of already sorted samples
+    """
+    if not sorted_samples:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_samples)), 1)
+    return sorted_samples[rank - 1]
+
+
+class LatencyStats:
+    """
+    Collect latency samples for each stage across a session
+    """
+
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.lock = threading.Lock()
+        self.samples: dict[str, deque] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self.lock:
+            try:
+                stage_samples = self.samples[stage]
+            except KeyError:
+                stage_samples = self.samples[stage] = deque(maxlen=self.max_samples)
+            stage_samples.append(seconds)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        :return: count and p50/p90/p99/max latency in milliseconds for each stage
+        """
+        with self.lock:
+            samples = {stage: sorted(values) for stage, values in self.samples.items()}
+
+        return {
+            stage: {
+                "count": len(values),
+                "p50_ms": percentile(values, 50) * 1000,
+                "p90_ms": percentile(values, 90) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": values[-1] * 1000 if values else 0.0,
+            }
+            for stage, values in samples.items()
+        }
+
+    def format_summary(self) -> str:
+        lines = []
+        for stage, values in self.summary().items():
+            lines.append(
+                f"{stage}: n={values['count']} "
+                f"p50={values['p50_ms']:.1f}ms "
+                f"p90={values['p90_ms']:.1f}ms "
+                f"p99={values['p99_ms']:.1f}ms "
+                f"max={values['max_ms']:.1f}ms"
+            )
+        return "\n".join(lines)
+
+
+class LatencyTracker:
+    """
+    Track the most recently observed split through the later stages.
+
+    Only the latest observation is tracked, if a newer split is observed
+    before an earlier one is displayed the earlier one is abandoned.
+    """
+
+    def __init__(self, stats: LatencyStats, enabled: bool = True):
+        self.stats = stats
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.observed: float | None = None
+
+    def observe(self, timestamp: float | None = None) -> None:
+        """
+        Start timing a new split
+
+        :param timestamp: time.perf_counter value when the split was observed
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.observed = time.perf_counter() if timestamp is None else timestamp
+
+    def mark(self, stage: str, finish: bool = False) -> None:
+        """
+        Record the time since the split was observed for a stage
+
+        :param stage: name of the stage reached
+        :param finish: this is the last stage for the split
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            observed = self.observed
+            if observed is None:
+                return
+            if finish:
+                self.observed = None
+        self.stats.add(stage, time.perf_counter() - observed)
@@ -1,10 +1,15 @@
 import re
 import socket
+import time
+from collections.abc import Callable
 from datetime import timedelta
+from enum import Enum
 import typing
 
 from ducktools.classbuilder.prefab import Prefab, attribute
 
+from . import tracing
+
 BUFFER_SIZE = 4096
 
 
@@ -36,6 +41,15 @@ def parse_time(time_str: str) -> timedelta:
     return result
 
 
+class ConnectionState(Enum):
+    """
+    State of the socket connection to the livesplit server
+    """
+    DISCONNECTED = "disconnected"
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+
+
 class LivesplitConnection(Prefab):
     """
     Socket based livesplit connection model
@@ -43,33 +57,98 @@ class LivesplitConnection(Prefab):
     server: str = "localhost"
     port: int = 16834
     timeout: int = 1
+    connect_timeout: float = 0.5
+    resolve_retry: float = 5.0
     sock: socket.socket | None = attribute(default=None, init=False, repr=False)
+    state: ConnectionState = attribute(
+        default=ConnectionState.DISCONNECTED, init=False, compare=False
+    )
+
+    # Address of the last successful connection, reused on reconnect to skip DNS
+    address_cache: tuple | None = attribute(default=None, init=False, repr=False, compare=False)
+    # Time of the last failed hostname lookup, used to avoid retrying DNS every poll
+    last_resolve_failure: float | None = attribute(
+        default=None, init=False, repr=False, compare=False
+    )
+    state_callbacks: list = attribute(
+        default_factory=list, init=False, repr=False, compare=False
+    )
+
+    def add_state_callback(self, callback: Callable[[ConnectionState], None]) -> None:
+        """
+        Register a function to be called with the new state whenever the
+        connection state changes.
+
+        :param callback: function taking a ConnectionState
+        """
+        self.state_callbacks.append(callback)
+
+    def remove_state_callback(self, callback: Callable[[ConnectionState], None]) -> None:
+        self.state_callbacks.remove(callback)
+
+    def set_state(self, state: ConnectionState) -> None:
+        if state != self.state:
+            self.state = state
+            for callback in self.state_callbacks:
+                callback(state)
 
     def connect(self) -> bool:
         """
         Attempt to connect to the livesplit server
         :return: True if connected, otherwise False
         """
+        if self.last_resolve_failure is not None:
+            if time.monotonic() - self.last_resolve_failure < self.resolve_retry:
+                # Hostname recently failed to resolve, don't hit DNS again yet
+                return False
+            self.last_resolve_failure = None
+
+        self.set_state(ConnectionState.CONNECTING)
+
+        address = self.address_cache or (self.server, self.port)
+
         self.sock = socket.socket()
+        # Small messages are sent constantly, disable Nagle and keep the link alive
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self.sock.settimeout(self.connect_timeout)
         try:
-            self.sock.connect((self.server, self.port))
-        except ConnectionRefusedError:
+            self.sock.connect(address)
+        except socket.gaierror:
+            # Could not resolve hostname
             self.sock.close()
             self.sock = None
+            self.last_resolve_failure = time.monotonic()
+            self.set_state(ConnectionState.DISCONNECTED)
             return False
-        except socket.gaierror:
-            # Could not resolve hostname
+        except OSError:
+            # Refused, timed out or unreachable
+            # Clear the cached address in case the host has moved
             self.sock.close()
             self.sock = None
+            self.address_cache = None
+            self.set_state(ConnectionState.DISCONNECTED)
             return False
         else:
+            try:
+                self.address_cache = self.sock.getpeername()
+            except OSError:
+                self.address_cache = None
             self.sock.settimeout(self.timeout)
+            self.set_state(ConnectionState.CONNECTED)
             return True
 
-    def close(self) -> None:
+    def disconnect(self) -> None:
+        """
+        Close the socket after an error, the next send or receive will reconnect.
+        """
         if self.sock:
             self.sock.close()
             self.sock = None
+        self.set_state(ConnectionState.DISCONNECTED)
+
+    def close(self) -> None:
+        self.disconnect()
 
     def send(self, msg: bytes) -> None:
         """
@@ -85,10 +164,10 @@ class LivesplitConnection(Prefab):
         
         if self.sock:  # Check again in case connection failed
             try:
-                self.sock.send(msg)
+                with tracing.span("livesplit.send", "livesplit"):
+                    self.sock.send(msg)
             except ConnectionAbortedError:
-                self.sock.close()
-                self.sock = None
+                self.disconnect()
                 raise ConnectionAbortedError("The connection has been closed by the host")
 
     def receive(self) -> bytes:
@@ -103,20 +182,19 @@ class LivesplitConnection(Prefab):
         
         if self.sock:
             try:
-                data_received = self.sock.recv(BUFFER_SIZE)
+                with tracing.span("livesplit.receive", "livesplit"):
+                    data_received = self.sock.recv(BUFFER_SIZE)
             except socket.timeout:
                 raise TimeoutError(
                     "No response received from the server within "
                     f"the timeout period ({self.timeout}s)"
                 )
             except OSError:
-                self.sock.close()
-                self.sock = None
+                self.disconnect()
                 raise ConnectionError("The connection has been closed by the host")
 
             if data_received == b"":
-                self.sock.close()
-                self.sock = None
+                self.disconnect()
                 raise ConnectionError("The connection has been closed by the host")
 
             return data_received
@@ -127,6 +205,10 @@ class LivesplitConnection(Prefab):
 class LivesplitMessaging(Prefab):
     connection: LivesplitConnection
 
+    @property
+    def state(self) -> ConnectionState:
+        return self.connection.state
+
     def connect(self) -> bool:
         return self.connection.connect()
 
@@ -295,6 +377,198 @@ class LivesplitMessaging(Prefab):
         return self.receive()
 
 
+class TimerPhase(str, Enum):
+    """
+    Timer phases as reported by the livesplit server
+    """
+    NOT_RUNNING = "NotRunning"
+    RUNNING = "Running"
+    ENDED = "Ended"
+    PAUSED = "Paused"
+
+
+class SplitEventType(Enum):
+    CONNECTED = "connected"
+    DISCONNECTED = "disconnected"
+    STARTED = "started"
+    SPLIT_ADVANCED = "split_advanced"
+    SKIP = "skip"
+    UNDO = "undo"
+    RESET = "reset"
+    PAUSED = "paused"
+    RESUMED = "resumed"
+    FINISHED = "finished"
+
+
+class SplitEvent(Prefab):
+    """
+    A change in the state of the livesplit timer
+    """
+    kind: SplitEventType
+    index: int
+    phase: TimerPhase | None = None
+    name: str | None = None
+    # time.perf_counter value when the watcher saw the change
+    observed: float = attribute(default=0.0, compare=False)
+
+
+class SplitWatcher(Prefab):
+    """
+    Poll a livesplit client and convert changes in split index and
+    timer phase into SplitEvents.
+
+    The watcher does no sleeping itself, call `poll` from the polling loop.
+    """
+    client: LivesplitMessaging
+    # Seconds a new state must be stable before it is reported
+    debounce: float = 0.0
+    # Also request the current split name when the state changes
+    track_names: bool = False
+
+    connected: bool = attribute(default=False, init=False)
+    index: int = attribute(default=-1, init=False)
+    phase: TimerPhase | None = attribute(default=None, init=False)
+    name: str | None = attribute(default=None, init=False)
+
+    pending: tuple | None = attribute(default=None, init=False, repr=False)
+    pending_since: float = attribute(default=0.0, init=False, repr=False)
+
+    def poll(self) -> list[SplitEvent]:
+        """
+        Query livesplit once and return any events since the last poll.
+
+        :return: list of events, empty if nothing changed
+        """
+        if not self.connected:
+            if not self.client.connect():
+                return []
+            self.connected = True
+            try:
+                self.index, self.phase = self.get_state()
+                self.name = self.get_name()
+            except (ConnectionError, TimeoutError, ValueError):
+                return self.disconnect()
+            self.pending = None
+            return [
+                SplitEvent(
+                    SplitEventType.CONNECTED,
+                    self.index,
+                    self.phase,
+                    self.name,
+                    observed=time.perf_counter(),
+                )
+            ]
+
+        try:
+            new_index, new_phase = self.get_state()
+        except (ConnectionError, TimeoutError, ValueError):
+            return self.disconnect()
+
+        if (new_index, new_phase) == (self.index, self.phase):
+            self.pending = None
+            return []
+
+        if self.debounce > 0:
+            now = time.monotonic()
+            if self.pending != (new_index, new_phase):
+                self.pending = (new_index, new_phase)
+                self.pending_since = now
+                return []
+            elif now - self.pending_since < self.debounce:
+                return []
+
+        self.pending = None
+        try:
+            events = self.get_events(new_index, new_phase)
+            if events and new_index != self.index:
+                self.name = self.get_name()
+        except (ConnectionError, TimeoutError, ValueError):
+            return self.disconnect()
+
+        self.index, self.phase = new_index, new_phase
+        observed = time.perf_counter()
+        for event in events:
+            event.name = self.name
+            event.observed = observed
+        return events
+
+    def get_state(self) -> tuple[int, TimerPhase | None]:
+        index = self.client.get_split_index()
+        phase_text = self.client.get_current_timer_phase()
+        try:
+            phase = TimerPhase(phase_text)
+        except ValueError:
+            phase = None
+        return index, phase
+
+    def get_name(self) -> str | None:
+        if self.track_names:
+            return self.client.get_current_split_name()
+        return None
+
+    def disconnect(self) -> list[SplitEvent]:
+        self.client.close()
+        self.connected = False
+        self.pending = None
+        return [
+            SplitEvent(SplitEventType.DISCONNECTED, self.index, self.phase, self.name)
+        ]
+
+    def last_split_skipped(self) -> bool:
+        """
+        Livesplit reports a skipped split as having no split time.
+        """
+        self.client.send("getlastsplittime")
+        return pattern.match(self.client.receive()) is None
+
+    def get_events(self, new_index: int, new_phase: TimerPhase | None) -> list[SplitEvent]:
+        """
+        Work out which events lead from the current state to the new state.
+        """
+        events = []
+
+        if new_phase == TimerPhase.NOT_RUNNING and self.phase != TimerPhase.NOT_RUNNING:
+            return [SplitEvent(SplitEventType.RESET, new_index, new_phase)]
+        elif self.phase == TimerPhase.NOT_RUNNING and new_phase != TimerPhase.NOT_RUNNING:
+            events.append(SplitEvent(SplitEventType.STARTED, new_index, new_phase))
+        elif new_index > self.index:
+            if self.last_split_skipped():
+                events.append(SplitEvent(SplitEventType.SKIP, new_index, new_phase))
+            else:
+                events.append(SplitEvent(SplitEventType.SPLIT_ADVANCED, new_index, new_phase))
+        elif new_index < self.index:
+            events.append(SplitEvent(SplitEventType.UNDO, new_index, new_phase))
+
+        if new_phase != self.phase:
+            if new_phase == TimerPhase.PAUSED:
+                events.append(SplitEvent(SplitEventType.PAUSED, new_index, new_phase))
+            elif new_phase == TimerPhase.ENDED:
+                events.append(SplitEvent(SplitEventType.FINISHED, new_index, new_phase))
+            elif self.phase == TimerPhase.PAUSED and new_phase == TimerPhase.RUNNING:
+                events.append(SplitEvent(SplitEventType.RESUMED, new_index, new_phase))
+
+        return events
+
+
+def parse_endpoint(endpoint: str, default_port: int = 16834) -> tuple[str, int]:
+    """
+    Convert a "hostname:port" string into a (hostname, port) tuple.
+
+    :param endpoint: hostname with an optional port
+    :param default_port: port to use if none is given
+    :return: hostname, port
+    """
+    hostname, sep, port = endpoint.strip().rpartition(":")
+    if not sep:
+        hostname, port = port, ""
+    if not hostname:
+        raise ValueError(f"No hostname given in livesplit server {endpoint!r}")
+    try:
+        return hostname, int(port) if port else default_port
+    except ValueError:
+        raise ValueError(f"Invalid port in livesplit server {endpoint!r}")
+
+
 def get_client(
         server: str = "localhost",
         port: int = 16834,
@@ -1,7 +1,13 @@
 """
 Handle parsing a notes file into separate pages of notes.
 """
+import functools
+import hashlib
 import os
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
 from pathlib import Path
 
 import bleach
@@ -9,6 +15,9 @@ import bleach.sanitizer
 import bleach.css_sanitizer
 import markdown
 
+from . import tracing
+from .search import SearchIndex
+
 
 PERMITTED_TAGS = {
     "p",
@@ -48,6 +57,28 @@ PERMITTED_ATTRIBUTES = {
 }
 
 
+# Extension of compiled notes bundles, see splitguides.compiler
+BUNDLE_SUFFIX = ".sgnotes"
+
+# Comment lines of the form [split: Name] mark the livesplit split a block belongs to
+SPLIT_NAME_PREFIX = "split:"
+
+# Livesplit subsplits are named "-Name" or "{Section}Name"
+subsplit_pattern = re.compile(r"^-|^\{[^}]*\}")
+
+
+def normalise_split_name(name: str) -> str:
+    """
+    Convert a split name to the form used as a key for name lookups.
+
+    Whitespace, case and livesplit subsplit markers are ignored.
+
+    :param name: Split name from livesplit or the notes file
+    :return: normalised name
+    """
+    return subsplit_pattern.sub("", name.strip()).strip().casefold()
+
+
 PERMITTED_STYLES = {
     "background-color",
     "color",
@@ -58,12 +89,91 @@ PERMITTED_STYLES = {
 }
 
 
+def split_hash(text: str) -> int:
+    """
+    Stable 64 bit hash of the text of a split
+    """
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class SplitIndex:
+    """
+    Compact index of the splits in a notes file.
+
+    For each split this holds the source line range, the number of note lines
+    and a hash of the text in flat arrays, so lookups and comparisons between
+    versions of the notes don't need to touch the text itself.
+    """
+
+    def __init__(self):
+        self.starts = array("L")  # First source line of each split
+        self.ends = array("L")  # Source line after the end of each split
+        self.line_counts = array("L")  # Note lines in each split, excluding comments
+        self.hashes = array("Q")
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def append(
+        self,
+        text: str,
+        start: int,
+        end: int,
+        line_count: int,
+        text_hash: int | None = None,
+    ) -> None:
+        """
+        Add a split to the index
+
+        :param text: text of the split
+        :param start: first source line of the split
+        :param end: source line after the end of the split
+        :param line_count: number of note lines in the split
+        :param text_hash: split_hash of the text if already known
+        """
+        self.starts.append(start)
+        self.ends.append(end)
+        self.line_counts.append(line_count)
+        self.hashes.append(split_hash(text) if text_hash is None else text_hash)
+
+    def clamp(self, start: int, end: int) -> tuple[int, int]:
+        """
+        Limit a range of split indices to the splits that exist.
+        """
+        return max(start, 0), min(end, len(self))
+
+    def split_for_line(self, line: int) -> int:
+        """
+        Find the split containing a source line
+
+        :param line: 0 based line number in the notes file
+        :return: index of the split, -1 if the line is before the first split
+                 or is a separator between splits
+        """
+        idx = bisect_right(self.starts, line) - 1
+        if idx < 0 or line >= self.ends[idx]:
+            return -1
+        return idx
+
+    def changed_splits(self, other: "SplitIndex") -> set[int]:
+        """
+        Get the indices of splits that differ between this and another index,
+        including any splits that only exist in one of them.
+        """
+        shared = min(len(self), len(other))
+        changed = {i for i in range(shared) if self.hashes[i] != other.hashes[i]}
+        changed.update(range(shared, max(len(self), len(other))))
+        return changed
+
+
 class Notes:
     """
     Class to handle notes and formatting
 
     Processing order is:
       Input -> Strip Comment lines (delimited by [ ])
+               (noting [split: Name] headers)
             -> Split by separator
             -> Store
             [Render Call]
@@ -97,7 +207,16 @@ class Notes:
         self.separator = separator
 
         self.notes = []
-        self.get_notes(note_stream)
+        self.split_names = {}
+        self.index = SplitIndex()
+        # Built on the first search
+        self.search_index: SearchIndex | None = None
+        # Rendered HTML for each split, only set for compiled notes
+        self.rendered: list[str] | None = None
+        self.source_hash: str | None = None
+        self.assets: list[str] = []
+        with tracing.span("notes.parse", "notes"):
+            self.get_notes(note_stream)
         self.safe_mode = True
         self.cleaner = get_cleaner(
             PERMITTED_TAGS, PERMITTED_ATTRIBUTES, PERMITTED_STYLES
@@ -110,25 +229,78 @@ class Notes:
         :param note_stream: iterable containing notes by line
         """
         split_notes = []
+        split_names = {}
+        split_index = SplitIndex()
         split = []
-        for line in note_stream:
+        split_start = 0
+        line_no = -1
+        for line_no, line in enumerate(note_stream):
             line = line.rstrip()  # remove newlines
             if line.startswith("[") and line.endswith("]"):
-                pass  # Ignore comment lines
+                # Ignore comment lines other than recording split names
+                comment = line[1:-1].strip()
+                if comment[:len(SPLIT_NAME_PREFIX)].lower() == SPLIT_NAME_PREFIX:
+                    name = normalise_split_name(comment[len(SPLIT_NAME_PREFIX):])
+                    split_names.setdefault(name, []).append(len(split_notes))
             elif line == self.separator:
                 # If the split is empty and the separator is blank
                 # Ignore the break
                 if not (split or self.separator):
+                    split_start = line_no + 1
                     continue
                 # Split segment on separator
-                split_notes.append("\n".join(split))
+                text = "\n".join(split)
+                split_notes.append(text)
+                split_index.append(text, split_start, line_no, len(split))
                 split = []
+                split_start = line_no + 1
             else:
                 split.append(line)
         else:
-            split_notes.append("\n".join(split))
+            text = "\n".join(split)
+            split_notes.append(text)
+            split_index.append(text, split_start, line_no + 1, len(split))
 
         self.notes = split_notes
+        self.split_names = split_names
+        self.index = split_index
+
+    def lookup_index(self, index, name=None):
+        """
+        Find the index of the notes for a split by name, falling back to the
+        positional index if the name is not found.
+
+        If the name appears more than once, the occurrence closest to the
+        positional index is used.
+
+        :param index: Split index reported by livesplit
+        :param name: Split name reported by livesplit
+        :return: index of the matching notes
+        """
+        if not name:
+            return index
+
+        indices = self.split_names.get(normalise_split_name(name))
+        if not indices:
+            return index
+        elif len(indices) == 1:
+            return indices[0]
+
+        pos = bisect_left(indices, index)
+        candidates = indices[max(pos - 1, 0):pos + 1]
+        return min(candidates, key=lambda i: abs(i - index))
+
+    def search(self, query):
+        """
+        Find the splits containing all of the words in a query
+
+        :param query: words to search for, the last may be incomplete
+        :return: sorted list of matching split indices
+        """
+        if self.search_index is None:
+            with tracing.span("notes.search_index", "notes"):
+                self.search_index = SearchIndex.from_notes(self)
+        return self.search_index.search(query)
 
     @classmethod
     def from_file(cls, path, separator=""):
@@ -137,10 +309,14 @@ class Notes:
 
         :param path: path to notes text file
         :param separator: The separator between split segments (default blank line)
+                          compiled notes use the separator they were compiled with
         :return: Instance of Notes parsed from the provided file
         """
         path = Path(path)
-        if path.suffix == ".txt":
+        if path.suffix == BUNDLE_SUFFIX:
+            from .compiler import load_bundle
+            return load_bundle(path)
+        elif path.suffix == ".txt":
             preprocessor = TextProcessor()
         elif path.suffix == ".md":
             preprocessor = MarkdownProcessor()
@@ -159,8 +335,7 @@ class Notes:
         :param end: Split index to end rendering
         :return: notes
         """
-        start = max(start, 0)
-        end = min(end, len(self.notes))
+        start, end = self.index.clamp(start, end)
 
         result = []
 
@@ -169,43 +344,92 @@ class Notes:
         else:
             for idx in range(start, end):
                 raw_split = self.notes[idx]
-                if self.preprocessor:
-                    split = self.preprocessor.process(raw_split)
+                if self.rendered is not None:
+                    split = self.rendered[idx]
+                elif self.preprocessor:
+                    with tracing.span("notes.preprocess", "notes"):
+                        split = self.preprocessor.process(raw_split)
                 else:
                     split = raw_split
                 result.append(split)
 
         # If in safe mode clean the HTML of unsafe data
+        # Compiled notes are cleaned again as they may come from someone else
         if self.safe_mode:
-            result = [self.cleaner.clean(html) for html in result]
+            with tracing.span("notes.sanitize", "notes"):
+                result = [self.cleaner.clean(html) for html in result]
 
         return result
 
 
-def get_cleaner(extra_tags, extra_attributes, extra_styles):
+class SharedCleaner:
     """
-    Get a HTML cleaner to remove dangerous tags
+    HTML cleaner that can be shared between Notes instances and threads.
 
-    This handles the external 'bleach' library.
-    :param extra_tags:
-    :param extra_attributes:
-    :param extra_styles:
-    :return:
+    The allowed tags, attributes and CSS sanitizer are built once, but bleach's
+    Cleaner holds its html5lib parser and serializer state so each thread
+    gets its own Cleaner, created the first time it cleans.
     """
+
+    def __init__(self, tags, attributes, css_sanitizer):
+        """
+        :param tags: set of allowed tags
+        :param attributes: dict of allowed attributes by tag
+        :param css_sanitizer: bleach CSSSanitizer for style attributes
+        """
+        self.tags = tags
+        self.attributes = attributes
+        self.css_sanitizer = css_sanitizer
+        self.local = threading.local()
+
+    def get_thread_cleaner(self) -> bleach.sanitizer.Cleaner:
+        try:
+            return self.local.cleaner
+        except AttributeError:
+            cleaner = self.local.cleaner = bleach.sanitizer.Cleaner(
+                tags=self.tags,
+                attributes=self.attributes,
+                css_sanitizer=self.css_sanitizer,
+            )
+            return cleaner
+
+    def clean(self, text: str) -> str:
+        return self.get_thread_cleaner().clean(text)
+
+
+@functools.lru_cache(maxsize=8)
+def _get_shared_cleaner(extra_tags, extra_attributes, extra_styles) -> SharedCleaner:
     valid_tags = set(bleach.sanitizer.ALLOWED_TAGS)
     valid_tags.update(extra_tags)
     valid_attributes = bleach.sanitizer.ALLOWED_ATTRIBUTES.copy()
-    valid_attributes.update(extra_attributes)
+    valid_attributes.update((tag, list(attrs)) for tag, attrs in extra_attributes)
 
     # Bleach 5.0 changed how CSS works, to avoid changing internals we'll wrap around this
     valid_styles = set(bleach.css_sanitizer.ALLOWED_CSS_PROPERTIES)
     valid_styles.update(extra_styles)
     css_sanitizer = bleach.css_sanitizer.CSSSanitizer(allowed_css_properties=valid_tags)
 
-    cleaner = bleach.sanitizer.Cleaner(
-        tags=valid_tags, attributes=valid_attributes, css_sanitizer=css_sanitizer
+    return SharedCleaner(valid_tags, valid_attributes, css_sanitizer)
+
+
+def get_cleaner(extra_tags, extra_attributes, extra_styles) -> SharedCleaner:
+    """
+    Get a HTML cleaner to remove dangerous tags
+
+    This handles the external 'bleach' library.
+    Cleaners are cached by their configuration so reloading notes
+    reuses the cleaner from the previous Notes instance.
+
+    :param extra_tags: tags to allow in addition to bleach's defaults
+    :param extra_attributes: dict of tag: attributes to allow
+    :param extra_styles: CSS properties to allow
+    :return: cleaner with a clean(text) method, safe to use from any thread
+    """
+    return _get_shared_cleaner(
+        frozenset(extra_tags),
+        tuple(sorted((tag, tuple(attrs)) for tag, attrs in extra_attributes.items())),
+        frozenset(extra_styles),
     )
-    return cleaner
 
 
 class TextProcessor:
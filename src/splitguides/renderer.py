@@ -0,0 +1,92 @@
+"""
+Build the full HTML page for a set of rendered splits.
+"""
+from jinja2 import Template
+
+from . import tracing
+
+# Placeholders rendered into the template in place of the notes
+# These should never appear in a real template
+NOTE_MARKERS = [
+    "\x00splitguides-note-a\x00",
+    "\x00splitguides-note-b\x00",
+    "\x00splitguides-note-c\x00",
+]
+
+
+class PageShell:
+    """
+    Render a notes template once and splice the rendered splits into the result.
+
+    The template is rendered with placeholder notes to find the text before,
+    between and after each note. If the template output for a note depends on
+    more than the note itself (for instance using loop.index) the shell falls
+    back to rendering the template for every update.
+    """
+
+    def __init__(self, template: Template):
+        """
+        :param template: jinja2 template with display settings already bound,
+                         rendered with a single 'notes' list argument
+        """
+        self.template = template
+
+        self.prefix: str | None = None
+        self.separator: str | None = None
+        self.suffix: str | None = None
+
+        self.build()
+
+    @property
+    def can_splice(self) -> bool:
+        return self.prefix is not None
+
+    @property
+    def shell_size(self) -> int:
+        """Characters of the page that are the same for every split"""
+        if self.prefix is None:
+            return 0
+        return len(self.prefix) + len(self.suffix)
+
+    def build(self) -> None:
+        """
+        Render the template with placeholder notes and store the static parts.
+        """
+        a, b, c = NOTE_MARKERS
+        two_notes = self.template.render(notes=[a, b])
+        three_notes = self.template.render(notes=[a, b, c])
+
+        if two_notes.count(a) != 1 or two_notes.count(b) != 1:
+            return
+
+        prefix, rest = two_notes.split(a)
+        separator, suffix = rest.split(b)
+
+        # Check the template output is consistent before trusting the splice
+        if three_notes != f"{prefix}{a}{separator}{b}{separator}{c}{suffix}":
+            return
+
+        self.prefix, self.separator, self.suffix = prefix, separator, suffix
+
+    def render(self, notes: list[str]) -> str:
+        """
+        Get the full page HTML for the given rendered splits.
+
+        The characters built for the page and for the notes within it are
+        recorded as the 'page.size' trace counter.
+
+        :param notes: list of HTML for each split
+        :return: page HTML
+        """
+        with tracing.span("template.render", "render"):
+            if self.prefix is not None and notes:
+                notes_html = self.separator.join(notes)
+                html = "".join([self.prefix, notes_html, self.suffix])
+                notes_size = len(notes_html)
+            else:
+                html = self.template.render(notes=notes)
+                notes_size = len(html)
+
+        tracing.counter("page.size", "render", page=len(html), notes=notes_size)
+
+        return html
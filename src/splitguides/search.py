@@ -0,0 +1,171 @@
+"""
+Full text search of the splits in a set of notes.
+
+Splits are tokenised from their text with HTML tags, markdown images and
+link targets removed, so the words searched are the words shown. Tokens are
+cached by split hash so rebuilding the index after an edit only tokenises
+the splits that changed.
+"""
+import re
+from bisect import bisect_left
+
+# HTML tags, and markdown images and links with the link text in group 2
+markup_pattern = re.compile(r"<[^>]*>|(!?)\[([^\]]*)\]\([^)]*\)")
+token_pattern = re.compile(r"\w+")
+
+PREVIEW_LENGTH = 80
+
+
+def strip_markup(text: str) -> str:
+    """
+    Remove tags and images from text, keeping only the text of links
+    """
+    def replace(match):
+        is_image, link_text = match.group(1), match.group(2)
+        if link_text is None or is_image:
+            return " "
+        return f" {link_text} "
+
+    return markup_pattern.sub(replace, text)
+
+
+def tokenise(text: str) -> list[str]:
+    """
+    Split text into lower case words for searching
+
+    :param text: split text or search query
+    :return: list of words in order
+    """
+    return token_pattern.findall(strip_markup(text).casefold())
+
+
+def preview(text: str, length: int = PREVIEW_LENGTH) -> str:
+    """
+    Get the first line of a split with tags removed to show in search results
+    """
+    for line in text.splitlines():
+        line = " ".join(strip_markup(line).split())
+        if line:
+            return line if len(line) <= length else f"{line[:length - 3]}..."
+    return ""
+
+
+class SearchIndex:
+    """
+    Inverted index from words to the splits containing them.
+
+    Words map to the hashes of the splits containing them rather than their
+    positions, so an edit that moves splits around only needs the positions
+    updated and the words of new or changed splits added.
+    """
+
+    def __init__(
+        self,
+        split_texts: list[str],
+        split_hashes,
+        previous: "SearchIndex | None" = None,
+    ):
+        """
+        :param split_texts: text of each split
+        :param split_hashes: hash of each split, from SplitIndex.hashes
+        :param previous: index of an earlier version of the notes to reuse
+        """
+        # Split hash -> indices of the splits with that hash
+        positions: dict[int, list[int]] = {}
+        for idx, split_hash in enumerate(split_hashes):
+            try:
+                positions[split_hash].append(idx)
+            except KeyError:
+                positions[split_hash] = [idx]
+
+        if previous:
+            tokens_by_hash = {
+                split_hash: tokens
+                for split_hash, tokens in previous.tokens_by_hash.items()
+                if split_hash in positions
+            }
+            # The previous index may still be in use, its sets are copied before changing
+            postings = previous.postings.copy()
+            copied = set()
+
+            # Remove splits that are no longer in the notes
+            for split_hash, tokens in previous.tokens_by_hash.items():
+                if split_hash in positions:
+                    continue
+                for token in tokens:
+                    if token not in copied:
+                        postings[token] = postings[token].copy()
+                        copied.add(token)
+                    postings[token].discard(split_hash)
+        else:
+            tokens_by_hash = {}
+            postings = {}
+            copied = set()
+
+        # Add new splits
+        for split_hash, indices in positions.items():
+            if split_hash in tokens_by_hash:
+                continue
+            tokens = frozenset(tokenise(split_texts[indices[0]]))
+            tokens_by_hash[split_hash] = tokens
+            for token in tokens:
+                if token in copied:
+                    postings[token].add(split_hash)
+                elif token in postings:
+                    postings[token] = postings[token] | {split_hash}
+                    copied.add(token)
+                else:
+                    postings[token] = {split_hash}
+                    copied.add(token)
+
+        # Drop words that are no longer used
+        for token in copied:
+            if not postings[token]:
+                del postings[token]
+
+        self.positions = positions
+        self.tokens_by_hash: dict[int, frozenset[str]] = tokens_by_hash
+        # Word -> hashes of the splits containing it
+        self.postings: dict[str, set[int]] = postings
+        self.vocabulary = sorted(postings)
+
+    @classmethod
+    def from_notes(cls, notes, previous: "SearchIndex | None" = None) -> "SearchIndex":
+        """
+        Build the search index for a Notes instance
+        """
+        return cls(notes.notes, notes.index.hashes, previous)
+
+    def prefix_matches(self, prefix: str) -> set[int]:
+        """
+        Get the hashes of the splits containing any word starting with prefix
+        """
+        result = set()
+        pos = bisect_left(self.vocabulary, prefix)
+        while pos < len(self.vocabulary) and self.vocabulary[pos].startswith(prefix):
+            result.update(self.postings[self.vocabulary[pos]])
+            pos += 1
+        return result
+
+    def search(self, query: str) -> list[int]:
+        """
+        Find the splits containing every word in the query.
+
+        The last word of the query also matches longer words starting with it
+        so results can be shown while typing.
+
+        :param query: words to search for
+        :return: sorted list of matching split indices
+        """
+        words = tokenise(query)
+        if not words:
+            return []
+
+        *whole_words, last_word = words
+        matches = self.prefix_matches(last_word)
+        for word in whole_words:
+            if not matches:
+                break
+            matches.intersection_update(self.postings.get(word, ()))
+
+        return sorted(idx for split_hash in matches for idx in self.positions[split_hash])
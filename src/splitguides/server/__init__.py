@@ -1 +1,5 @@
-from .split_server import app as app, get_notes as get_notes, settings as settings
+from .split_server import (
+    app as app,
+    add_notes as add_notes,
+    settings as settings,
+)
@@ -1,15 +1,133 @@
+import argparse
 from pathlib import Path
 
-from PySide6.QtWidgets import QApplication, QMainWindow
 import waitress
 
-from splitguides.server import app, get_notes, settings
+from splitguides import tracing
+from splitguides.server import app, add_notes, settings
 from splitguides.server import split_server
 
-from splitguides.ui.server_settings_ui import ServerSettingsDialog
 
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="splitguides-server",
+        description=(
+            "Serve SplitGuides notes to a browser. "
+            "Without --notes the settings and notes are chosen using dialogs."
+        ),
+    )
+    parser.add_argument(
+        "--notes",
+        action="append",
+        metavar="PATH",
+        help="Notes file to serve without showing any dialogs, can be given multiple times",
+    )
+    parser.add_argument(
+        "--host",
+        help=f"Hostname to serve on (default: {settings.server_hostname})",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        help=f"Port to serve on (default: {settings.server_port})",
+    )
+    parser.add_argument(
+        "--livesplit",
+        action="append",
+        metavar="HOST[:PORT]",
+        help=(
+            "Livesplit server to follow with --notes, can be given multiple times. "
+            "Each notes file uses the livesplit server in the same position, "
+            "any extra notes files use the first. "
+            f"(default: {settings.hostname}:{settings.port})"
+        ),
+    )
+    parser.add_argument(
+        "--websocket-port",
+        type=int,
+        metavar="PORT",
+        help=(
+            "Also serve the notes over websockets on this port, "
+            "allowing browsers to change their own offset (requires 'websockets')"
+        ),
+    )
+    return parser
+
+
+def launch(argv=None):
+    tracing.enable_from_environment()
+
+    parser = get_parser()
+    args = parser.parse_args(argv)
+
+    # The dialogs bind the notes to the livesplit server from the settings
+    if args.livesplit and not args.notes:
+        parser.error("--livesplit requires --notes")
+
+    if args.websocket_port:
+        split_server.websocket_port = args.websocket_port
+
+    if args.notes:
+        apply_overrides(args)
+        launch_headless(args.notes, args.livesplit)
+    else:
+        launch_qt(args)
+
+
+def apply_overrides(args):
+    """
+    Use the server hostname and port given on the command line.
+
+    These are applied after any dialogs have saved the settings,
+    so settings given on the command line are not saved.
+    """
+    if args.host:
+        settings.server_hostname = args.host
+    if args.port:
+        settings.server_port = args.port
+
+
+def launch_headless(notes_paths, livesplit_servers=None):
+    """
+    Serve the given notes without using Qt, settings are not saved.
+
+    :param notes_paths: paths to notes files
+    :param livesplit_servers: "hostname:port" for each livesplit server,
+                              notes are bound to the server in the same position
+    """
+    from splitguides.livesplit_client import parse_endpoint
+
+    endpoints = []
+    if livesplit_servers:
+        try:
+            endpoints = [parse_endpoint(server) for server in livesplit_servers]
+        except ValueError as e:
+            print(f"{e}, closing application.")
+            return
+
+        settings.hostname, settings.port = endpoints[0]
+
+    for i, notes_path in enumerate(notes_paths):
+        notes_path = Path(notes_path)
+        if not notes_path.is_file():
+            print(f"Notes file '{notes_path}' not found, closing application.")
+            return
+
+        # Notes beyond the number of livesplit servers use the first
+        if endpoints:
+            hostname, port = endpoints[i] if i < len(endpoints) else endpoints[0]
+            add_notes(notes_path, livesplit=f"{hostname}:{port}")
+        else:
+            add_notes(notes_path)
+
+    serve()
+
+
+def launch_qt(args=None):
+    # Qt is only needed for the dialogs
+    from PySide6.QtWidgets import QApplication, QMainWindow
+    from splitguides.ui.server_settings_ui import ServerSettingsDialog, get_notes
 
-def launch():
     # Create a base application and main window for the dialogs to use as parent
     qt_app = QApplication()
     main_window = QMainWindow()
@@ -25,12 +143,22 @@ def launch():
         qt_app.quit()
         return
 
-    success = get_notes(main_window)  # Sets internal 'notes' and 'notefile' variables
+    success = get_notes(main_window, settings)  # Adds the selected notes to split_server.documents
     if not success:
         print("No notes file selected, closing application.")
         qt_app.quit()
         return
 
+    if args:
+        apply_overrides(args)
+
+    try:
+        serve()
+    finally:
+        qt_app.quit()
+
+
+def serve():
     print(
         "This server version of SplitGuides allows you view notes via a browser window "
         "and should work across a local network.\n"
@@ -49,18 +177,41 @@ def launch():
         f"in order to view the notes."
     )
 
+    if len(split_server.documents) > 1:
+        print("Each notes file is also available at:")
+        for name in split_server.documents:
+            print(f"  http://{settings.server_hostname}:{settings.server_port}/n/{name}/")
+
+    if split_server.websocket_port:
+        try:
+            from splitguides.server.websocket_server import start_websocket_server
+        except ImportError:
+            print("The 'websockets' package is not installed, websockets are disabled.")
+            split_server.websocket_port = None
+        else:
+            try:
+                start_websocket_server(settings.server_hostname, split_server.websocket_port)
+            except OSError as e:
+                print(f"{e}, websockets are disabled.")
+                split_server.websocket_port = None
+            else:
+                print(
+                    f"Websocket connections are served on port {split_server.websocket_port}, "
+                    f"use + and - in the browser to change the offset."
+                )
+
     print("Press ctrl+c to close the server.")
 
     try:
         waitress.serve(
             app,
             host=settings.server_hostname,
-            port=settings.server_port
+            port=settings.server_port,
+            threads=split_server.SERVER_THREADS,
+            outbuf_high_watermark=split_server.OUTBUF_HIGH_WATERMARK,
         )
     except KeyboardInterrupt:
         print("Interrupt received, closing application.")
-    finally:
-        qt_app.quit()
 
 
 if __name__ == "__main__":
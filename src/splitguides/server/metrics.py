@@ -0,0 +1,131 @@
+"""
+Minimal counters and histograms for the split server.
+
+Output is in the Prometheus text exposition format for /metrics
+and as a dictionary for the JSON /status page.
+"""
+import math
+import threading
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5
+)
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: int | float = 1) -> None:
+        with self.lock:
+            self.value += amount
+
+    def as_dict(self):
+        return self.value
+
+    def exposition(self) -> list[str]:
+        return [f"{self.name} {format_value(self.value)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: int | float = 1) -> None:
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value: int | float) -> None:
+        with self.lock:
+            self.value = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.lock = threading.Lock()
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        with self.lock:
+            self.count += 1
+            self.sum += value
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    self.bucket_counts[i] += 1
+                    break
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "mean": self.sum / self.count if self.count else 0.0,
+            }
+
+    def exposition(self) -> list[str]:
+        with self.lock:
+            lines = []
+            cumulative = 0
+            for upper, count in zip(self.buckets, self.bucket_counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{le="{format_value(upper)}"}} {cumulative}'
+                )
+            lines.append(f"{self.name}_sum {format_value(self.sum)}")
+            lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Collection of named metrics
+    """
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name!r} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self.register(Counter(name, description))
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self.register(Gauge(name, description))
+
+    def histogram(self, name: str, description: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, buckets))
+
+    def as_dict(self) -> dict:
+        return {name: metric.as_dict() for name, metric in self.metrics.items()}
+
+    def exposition(self) -> str:
+        """
+        Get all metrics in the Prometheus text format
+        """
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.exposition())
+        return "\n".join(lines) + "\n"
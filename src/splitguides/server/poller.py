@@ -0,0 +1,224 @@
+"""
+Shared livesplit polling for the split server.
+
+One poller thread runs per livesplit endpoint while any stream is subscribed,
+streams wait on the poller for changes instead of each holding their own
+livesplit connection.
+"""
+import threading
+import time
+from collections.abc import Callable
+
+from ducktools.classbuilder.prefab import Prefab, attribute
+
+from ..livesplit_client import get_client, SplitEventType, SplitWatcher
+from .metrics import Counter, Histogram
+
+POLL_INTERVAL = 0.1
+
+
+class PollerState(Prefab):
+    """
+    Snapshot of the livesplit state, version increases on each change.
+    """
+    version: int = 0
+    connected: bool = False
+    index: int = -1
+    name: str | None = None
+    observed: float = attribute(default=0.0, compare=False)
+
+
+class LivesplitPoller:
+    """
+    Poll a single livesplit server on a background thread and notify waiting streams.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        *,
+        track_names: bool = False,
+        interval: float = POLL_INTERVAL,
+        poll_seconds: Histogram | None = None,
+        connects: Counter | None = None,
+        disconnects: Counter | None = None,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.interval = interval
+        self.track_names = track_names
+
+        self.poll_seconds = poll_seconds
+        self.connects = connects
+        self.disconnects = disconnects
+
+        self.condition = threading.Condition()
+        self.state = PollerState()
+        # True once the running thread has completed its first poll,
+        # until then the state may be the default or left from an earlier run
+        self.polled = False
+        self.subscribers = 0
+        # Callbacks for streams that can't wait on the condition (websockets)
+        self.listeners: list[Callable[[], None]] = []
+        self.thread: threading.Thread | None = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}(hostname={self.hostname!r}, port={self.port!r})"
+
+    def subscribe(self) -> None:
+        """
+        Register a stream as using this poller, starting the polling thread if needed.
+        """
+        with self.condition:
+            self.subscribers += 1
+            if self.thread is None or not self.thread.is_alive():
+                self.polled = False
+                self.thread = threading.Thread(
+                    target=self.run,
+                    name=f"livesplit-poller-{self.hostname}:{self.port}",
+                    daemon=True,
+                )
+                self.thread.start()
+
+    def unsubscribe(self) -> None:
+        with self.condition:
+            self.subscribers -= 1
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        """
+        Add a callback to be called from the polling thread on each change or notify.
+        """
+        with self.condition:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[], None]) -> None:
+        with self.condition:
+            self.listeners.remove(listener)
+
+    def call_listeners(self) -> None:
+        with self.condition:
+            listeners = self.listeners.copy()
+        for listener in listeners:
+            listener()
+
+    def wait_for_change(
+        self,
+        version: int | None,
+        timeout: float,
+        changed: Callable[[], bool] | None = None,
+    ) -> PollerState:
+        """
+        Wait until the state differs from the given version or the timeout passes.
+
+        :param version: last state version seen by the caller,
+                        None to get the state once the poller has polled livesplit
+        :param timeout: maximum time to wait in seconds
+        :param changed: additional check for other changes the caller should wake for,
+                        other threads call notify after making such a change
+        :return: the current state
+        """
+        with self.condition:
+            if version is None:
+                # Don't report the state before the first poll, it may not be true
+                self.condition.wait_for(lambda: self.polled, timeout)
+            else:
+                self.condition.wait_for(
+                    lambda: self.state.version != version or bool(changed and changed()),
+                    timeout,
+                )
+            return self.state
+
+    def notify(self) -> None:
+        """
+        Wake all waiting streams so they can check for changes outside of livesplit.
+        """
+        with self.condition:
+            self.condition.notify_all()
+        self.call_listeners()
+
+    def update(self, **changes) -> None:
+        with self.condition:
+            self.set_state(**changes)
+        self.call_listeners()
+
+    def set_state(self, **changes) -> None:
+        """
+        Replace the state with the given changes, must be called with the condition held.
+        Listeners are not called, use update unless the lock must be kept.
+        """
+        values = {
+            "connected": self.state.connected,
+            "index": self.state.index,
+            "name": self.state.name,
+            "observed": self.state.observed,
+        }
+        values.update(changes)
+        self.state = PollerState(version=self.state.version + 1, **values)
+        self.condition.notify_all()
+
+    def stop(self, connected: bool) -> None:
+        """
+        Mark the polling thread as stopped, must be called with the condition held.
+
+        Livesplit is marked as disconnected in the same lock as the thread is
+        cleared, so it can't overwrite the state from a newly started thread.
+        """
+        self.thread = None
+        self.polled = False
+        if connected:
+            self.set_state(connected=False)
+
+    def run(self) -> None:
+        """
+        Polling loop, runs until there are no subscribers left.
+        """
+        watcher = SplitWatcher(
+            get_client(self.hostname, self.port), track_names=self.track_names
+        )
+        try:
+            while True:
+                with self.condition:
+                    if self.subscribers <= 0:
+                        self.stop(watcher.connected)
+                        break
+
+                poll_start = time.perf_counter()
+                events = watcher.poll()
+                if self.poll_seconds:
+                    self.poll_seconds.observe(time.perf_counter() - poll_start)
+
+                if events:
+                    self.handle_events(events)
+
+                if not self.polled:
+                    with self.condition:
+                        self.polled = True
+                        self.condition.notify_all()
+
+                time.sleep(self.interval)
+        except BaseException:
+            with self.condition:
+                if self.thread is threading.current_thread():
+                    self.stop(watcher.connected)
+            self.call_listeners()
+            raise
+        finally:
+            watcher.client.close()
+
+        self.call_listeners()
+
+    def handle_events(self, events) -> None:
+        for event in events:
+            if event.kind == SplitEventType.CONNECTED and self.connects:
+                self.connects.inc()
+            elif event.kind == SplitEventType.DISCONNECTED and self.disconnects:
+                self.disconnects.inc()
+
+        event = events[-1]
+        self.update(
+            connected=event.kind != SplitEventType.DISCONNECTED,
+            index=event.index,
+            name=event.name,
+            observed=event.observed,
+        )
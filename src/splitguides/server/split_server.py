@@ -1,17 +1,55 @@
 import random
 import secrets
 import string
+import threading
 import time
+from collections.abc import Callable
+from contextlib import nullcontext
 from pathlib import Path
 
-from flask import Flask, Response, render_template, send_from_directory
-from PySide6.QtWidgets import QFileDialog
+from flask import (
+    Flask,
+    Response,
+    abort,
+    jsonify,
+    render_template,
+    request,
+    send_from_directory,
+)
+from jinja2 import FileSystemBytecodeCache
 
-from ..settings import ServerSettings
-from ..livesplit_client import get_client
+from ..settings import ServerSettings, TEMPLATE_CACHE_FOLDER
+from ..livesplit_client import parse_endpoint
+from ..assets import PRELOAD_SPLITS, AssetPipeline, preload_links
 from ..note_parser import Notes
+from ..search import SearchIndex, preview
+from ..latency import LatencyStats, LatencyTracker, latency_enabled
+from .metrics import MetricsRegistry
+from .poller import LivesplitPoller, PollerState
+from .watchdog import SendWatchdog, get_connection_closer
 
 KEEP_ALIVE = 10
+# How often to check notes files for changes
+RELOAD_INTERVAL = 0.5
+# Close streams to clients that are blocked for longer than this accepting an event,
+# the browser will reconnect once it is able to
+SEND_TIMEOUT = 10
+# Limit on data waitress will buffer for a client before the stream waits for it
+OUTBUF_HIGH_WATERMARK = 256 * 1024
+# Each open stream uses a waitress thread
+SERVER_THREADS = 16
+# Time in milliseconds browsers should wait before reconnecting a dropped stream
+RETRY_MS = 1000
+# Limit on the number of splits a client can ask to see either side of the current split
+MAX_WINDOW = 10
+# Cache key for the end of splits marker, split hashes are never negative
+END_OF_SPLITS = -1
+MAX_SEARCH_RESULTS = 50
+
+DISCONNECTED_MESSAGE = (
+    "<h2>Trying to connect to livesplit.</h2>"
+    "<h3>Make sure Livesplit server is running.</h3>"
+)
 
 settings = ServerSettings.load()
 
@@ -20,15 +58,494 @@ app = Flask(
     template_folder=settings.html_template_folder,
     static_folder=settings.css_folder,
 )
+app.jinja_options = {
+    **app.jinja_options,
+    "bytecode_cache": FileSystemBytecodeCache(TEMPLATE_CACHE_FOLDER),
+}
 
+# The first notes file added, served at the root of the server
 notefile: None | Path = None
 notes: None | Notes = None
+# Port of the optional websocket server, None if it is not running
+websocket_port: None | int = None
+
+start_time = time.time()
+# Included in event ids so ids from before a restart are never matched
+run_id = secrets.token_hex(4)
+
+metrics = MetricsRegistry()
+sse_clients = metrics.gauge(
+    "splitguides_sse_clients", "Connected server-sent event clients"
+)
+sse_events = metrics.counter(
+    "splitguides_sse_events_total", "Server-sent events sent to clients"
+)
+sse_send_seconds = metrics.histogram(
+    "splitguides_sse_send_seconds", "Time taken for clients to accept each event"
+)
+sse_dropped_updates = metrics.counter(
+    "splitguides_sse_dropped_updates_total",
+    "Updates skipped as a newer state was available before the client was ready",
+)
+sse_evictions = metrics.counter(
+    "splitguides_sse_evictions_total", "Streams closed as the client was too slow"
+)
+poll_seconds = metrics.histogram(
+    "splitguides_livesplit_poll_seconds", "Time taken to poll livesplit for changes"
+)
+render_seconds = metrics.histogram(
+    "splitguides_render_seconds", "Time taken to render the notes for a split"
+)
+livesplit_connects = metrics.counter(
+    "splitguides_livesplit_connects_total", "Successful connections to livesplit"
+)
+livesplit_disconnects = metrics.counter(
+    "splitguides_livesplit_disconnects_total", "Connections to livesplit lost"
+)
+notes_reloads = metrics.counter(
+    "splitguides_notes_reloads_total", "Notes files reloaded after being edited"
+)
+
+# Split to event sent latency, shared by all streams
+latency_stats = LatencyStats()
 
 app.secret_key = "".join(
     secrets.choice(string.printable) for _ in range(random.randint(30, 40))
 )
 
 
+class NotesDocument:
+    """
+    A notes file served by the server along with its rendered splits
+
+    Splits are rendered and cached individually so clients showing different
+    numbers of splits around the current one share the same renders.
+    Renders are keyed by the hash of the split text, so they survive the
+    splits moving when the notes are edited.
+    """
+
+    def __init__(self, name: str, path: Path, notes: Notes, livesplit: tuple[str, int]):
+        self.name = name
+        self.path = path
+        self.notes = notes
+        # livesplit server (hostname, port) the notes follow
+        self.livesplit = livesplit
+        self.assets = AssetPipeline(path.parent)
+        # The markdown processor is not thread safe, only one render at a time
+        self.lock = threading.Lock()
+        # Rendered HTML for each split keyed by split hash, images are inlined
+        # for each render as they may change without the notes changing
+        self.cache: dict[int, str] = {}
+        # Increased each time the notes are reloaded
+        self.version = 0
+        self.mtime = self.get_mtime()
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"name={self.name!r}, path={self.path!r}, livesplit={self.livesplit!r})"
+        )
+
+    def render(
+        self,
+        index: int,
+        previous_splits: int | None = None,
+        next_splits: int | None = None,
+    ) -> str:
+        """
+        Get the event data for the notes around a split index
+
+        :param index: split index to display
+        :param previous_splits: splits to show before the index, default from settings
+        :param next_splits: splits to show after the index, default from settings
+        :return: HTML for the event with newlines removed, followed by
+                 preload links for media in the next few splits
+        """
+        if previous_splits is None:
+            previous_splits = settings.previous_splits
+        if next_splits is None:
+            next_splits = settings.next_splits
+
+        with self.lock:
+            start, end = self.notes.index.clamp(
+                index - previous_splits, index + next_splits + 1
+            )
+            if start >= end:
+                return self.render_split(len(self.notes.index))
+
+            # Images are inlined for each render so edits to them are shown
+            splits = [self.render_split(i) for i in range(start, end)]
+            data = "".join(self.assets.process(splits))
+
+            # Rendering the upcoming splits also means they are cached when reached
+            _, preload_end = self.notes.index.clamp(end, end + PRELOAD_SPLITS)
+            upcoming = [self.render_split(i) for i in range(end, preload_end)]
+            return data + preload_links(upcoming)
+
+    def render_split(self, index: int) -> str:
+        """
+        Get the rendered HTML for a single split, must be called with the lock held.
+
+        :param index: split index, the index after the last split gives the end marker
+        :return: HTML for the split with newlines removed
+        """
+        split_index = self.notes.index
+        key = END_OF_SPLITS if index >= len(split_index) else split_index.hashes[index]
+        try:
+            return self.cache[key]
+        except KeyError:
+            pass
+
+        render_start = time.perf_counter()
+        # Remove newlines from the notes as they break the send
+        data = "".join(self.notes.render_splits(index, index + 1)).replace("\n", "")
+        render_seconds.observe(time.perf_counter() - render_start)
+
+        self.cache[key] = data
+        return data
+
+    def search(self, query: str) -> list[dict]:
+        """
+        Search the notes
+
+        :param query: words to search for
+        :return: list of {"index": split index, "preview": first line of the split}
+        """
+        with self.lock:
+            notes = self.notes
+            indices = notes.search(query)[:MAX_SEARCH_RESULTS]
+        return [{"index": idx, "preview": preview(notes.notes[idx])} for idx in indices]
+
+    def get_index(self, state: PollerState) -> int:
+        """
+        Get the index of the notes to show for a livesplit state
+        """
+        index = state.index
+        if settings.split_name_matching:
+            index = self.notes.lookup_index(index, state.name)
+        return max(index, 0)
+
+    def get_mtime(self) -> int | None:
+        try:
+            return self.path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def check_for_changes(self) -> bool:
+        """
+        Reload the notes if the file has been modified since it was last read.
+        The version is also increased if any images in the notes have changed.
+
+        :return: True if the notes or their images have changed
+        """
+        assets_changed = self.assets.check_for_changes()
+        if assets_changed:
+            with self.lock:
+                self.version += 1
+
+        mtime = self.get_mtime()
+        if mtime is None or mtime == self.mtime:
+            return assets_changed
+
+        try:
+            new_notes = Notes.from_file(self.path, settings.split_separator)
+        except (OSError, ValueError):
+            # Probably caught partway through being saved, try again on the next check
+            return assets_changed
+
+        self.mtime = mtime
+        return self.reload(new_notes) or assets_changed
+
+    def reload(self, new_notes: Notes) -> bool:
+        """
+        Replace the notes if any splits have changed, discarding cached renders
+        of splits that no longer exist.
+
+        :param new_notes: newly parsed notes
+        :return: True if the notes were replaced
+        """
+        with self.lock:
+            changed = self.notes.index.changed_splits(new_notes.index)
+            if not changed and self.notes.split_names == new_notes.split_names:
+                return False
+
+            hashes = set(new_notes.index.hashes)
+            self.cache = {
+                key: data for key, data in self.cache.items()
+                if key in hashes or key == END_OF_SPLITS
+            }
+
+            if self.notes.search_index is not None:
+                new_notes.search_index = SearchIndex.from_notes(
+                    new_notes, self.notes.search_index
+                )
+
+            self.notes = new_notes
+            self.version += 1
+
+        notes_reloads.inc()
+        return True
+
+
+documents: dict[str, NotesDocument] = {}
+root_document: NotesDocument | None = None
+pollers: dict[tuple[str, int], LivesplitPoller] = {}
+pollers_lock = threading.Lock()
+notes_watcher: threading.Thread | None = None
+send_watchdog = SendWatchdog()
+
+
+def get_endpoint(livesplit: None | str) -> tuple[str, int]:
+    """
+    Get the (hostname, port) of a livesplit server
+
+    :param livesplit: None for the main livesplit server or a "hostname:port" string
+    :return: hostname, port
+    """
+    if livesplit is None:
+        return settings.hostname, settings.port
+    return parse_endpoint(livesplit)
+
+
+def add_notes(path, livesplit: None | str = None) -> NotesDocument:
+    """
+    Parse a notes file and serve it at /n/<name>/ where name is the file stem.
+    The first file added is also served at the root of the server.
+
+    :param path: path to the notes file
+    :param livesplit: livesplit server for these notes, see get_endpoint
+    :return: the new NotesDocument
+    """
+    global notes, notefile, root_document
+
+    path = Path(path)
+    name = path.stem
+    suffix = 2
+    while name in documents:
+        name = f"{path.stem}-{suffix}"
+        suffix += 1
+
+    document = NotesDocument(
+        name,
+        path,
+        Notes.from_file(path, settings.split_separator),
+        get_endpoint(livesplit),
+    )
+    documents[name] = document
+
+    if root_document is None:
+        root_document = document
+        notefile, notes = path, document.notes
+
+    return document
+
+
+def get_document(name: str | None = None) -> NotesDocument:
+    """
+    Get a notes document by name, or the root document if no name is given.
+    """
+    document = root_document if name is None else documents.get(name)
+    if document is None:
+        abort(404)
+    return document
+
+
+def get_poller(hostname: str, port: int) -> LivesplitPoller:
+    """
+    Get the shared poller for a livesplit server, creating it if needed.
+    """
+    with pollers_lock:
+        try:
+            poller = pollers[hostname, port]
+        except KeyError:
+            poller = pollers[hostname, port] = LivesplitPoller(
+                hostname,
+                port,
+                track_names=settings.split_name_matching,
+                poll_seconds=poll_seconds,
+                connects=livesplit_connects,
+                disconnects=livesplit_disconnects,
+            )
+        return poller
+
+
+def watch_notes() -> None:
+    """
+    Check the served notes files for changes, waking the streams for any that are reloaded.
+    """
+    global notes
+    while True:
+        for document in list(documents.values()):
+            if document.check_for_changes():
+                if document is root_document:
+                    notes = document.notes
+                get_poller(*document.livesplit).notify()
+        time.sleep(RELOAD_INTERVAL)
+
+
+def start_notes_watcher() -> None:
+    global notes_watcher
+    with pollers_lock:
+        if notes_watcher is None:
+            notes_watcher = threading.Thread(
+                target=watch_notes, name="notes-watcher", daemon=True
+            )
+            notes_watcher.start()
+
+
+def get_window(previous_splits: int | None, next_splits: int | None) -> tuple[int, int]:
+    """
+    Get the number of splits to show around the current split for a client
+
+    :param previous_splits: requested splits before the current, None for the default
+    :param next_splits: requested splits after the current, None for the default
+    :return: previous_splits, next_splits limited to 0 to MAX_WINDOW
+    """
+    if previous_splits is None:
+        previous_splits = settings.previous_splits
+    if next_splits is None:
+        next_splits = settings.next_splits
+    return (
+        min(max(previous_splits, 0), MAX_WINDOW),
+        min(max(next_splits, 0), MAX_WINDOW),
+    )
+
+
+def get_event_id(document: NotesDocument, index: int, connected: bool) -> str:
+    """
+    Get an event id identifying the content of an event
+
+    :param document: notes being streamed
+    :param index: split index shown
+    :param connected: livesplit connection state
+    :return: event id
+    """
+    return f"{run_id}-{document.version}-{index}{'' if connected else '-d'}"
+
+
+def event_stream(
+    document: NotesDocument,
+    poller: LivesplitPoller,
+    last_event_id: str | None = None,
+    window: tuple[int, int] | None = None,
+    close: Callable[[], None] | None = None,
+):
+    """
+    Handle the stream of note updates, when the livesplit state or the notes
+    change - push the update otherwise just keep alive every 10s.
+
+    Events have ids that identify their content, if a reconnecting client sends
+    the id of the event it is already showing that event is not sent again.
+
+    Only the latest state is sent, any states that came and went while the
+    client was still receiving the previous event are skipped. If the client
+    is blocked for longer than SEND_TIMEOUT accepting an event the connection
+    is closed, ending the stream.
+
+    :param document: notes to send
+    :param poller: poller for the livesplit server the notes follow
+    :param last_event_id: id of the event the client is currently showing
+    :param window: (previous_splits, next_splits) to show, default from settings
+    :param close: function to close the client connection from another thread,
+                  slow clients are not evicted if this is not given
+    """
+    previous_splits, next_splits = window if window else get_window(None, None)
+    latency = LatencyTracker(latency_stats, enabled=latency_enabled())
+    # Define empty data, used to display the last notes even if disconnected
+    data = ""
+    index = -1
+    version = None
+    notes_version = document.version
+
+    def notes_changed():
+        return document.version != notes_version
+
+    def evict():
+        sse_evictions.inc()
+        close()
+
+    poller.subscribe()
+    sse_clients.inc()
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+
+        while True:
+            state = poller.wait_for_change(version, timeout=KEEP_ALIVE, changed=notes_changed)
+
+            event_id = None
+            if state.version == version and not notes_changed():
+                message = ":No update, keep connection\n\n"
+            elif state.connected:
+                if state.version != version:
+                    latency.observe(state.observed)
+                    if version is not None and state.version - version > 1:
+                        sse_dropped_updates.inc(state.version - version - 1)
+                version = state.version
+                notes_version = document.version
+
+                index = document.get_index(state)
+                data = document.render(index, previous_splits, next_splits)
+                latency.mark("render")
+                event_id = get_event_id(document, index, connected=True)
+                message = f"id: {event_id}\ndata: {data}\n\n"
+            else:
+                version = state.version
+                notes_version = document.version
+                event_id = get_event_id(document, index, connected=False)
+                message = f"id: {event_id}\ndata: {DISCONNECTED_MESSAGE}{data}\n\n"
+
+            if event_id is not None:
+                if event_id == last_event_id:
+                    # The client is already showing this
+                    message = ":No update, keep connection\n\n"
+                last_event_id = event_id
+
+            # The generator resumes once the server has written the event,
+            # if the client stops reading the watchdog closes the connection
+            deadline = send_watchdog.deadline(SEND_TIMEOUT, evict) if close else nullcontext()
+            send_start = time.perf_counter()
+            with deadline:
+                yield message
+            sse_send_seconds.observe(time.perf_counter() - send_start)
+            sse_events.inc()
+            latency.mark("sse_flush", finish=True)
+    finally:
+        sse_clients.dec()
+        poller.unsubscribe()
+
+
+def notes_response(document: NotesDocument):
+    return render_template(
+        settings.html_template_file,
+        notefile=document.name,
+        websocket_port=websocket_port,
+    )
+
+
+def splits_response(document: NotesDocument):
+    start_notes_watcher()
+    poller = get_poller(*document.livesplit)
+    window = get_window(
+        request.args.get("previous", type=int),
+        request.args.get("next", type=int),
+    )
+    return Response(
+        event_stream(
+            document,
+            poller,
+            request.headers.get("Last-Event-ID"),
+            window,
+            close=get_connection_closer(request.environ),
+        ),
+        mimetype="text/event-stream",
+    )
+
+
+def search_response(document: NotesDocument):
+    query = request.args.get("q", "")
+    return jsonify(query=query, results=document.search(query))
+
+
 # noinspection PyUnresolvedReferences
 @app.route("/")
 def notes_page():
@@ -36,9 +553,7 @@ def notes_page():
     Render the basic page as index.
     :return:
     """
-    global notefile
-    assert notefile is not None
-    return render_template(settings.html_template_file, notefile=notefile.stem)
+    return notes_response(get_document())
 
 
 @app.route("/splits")
@@ -47,93 +562,84 @@ def split():
     Server-sent events handler
     :return: server-sent events
     """
+    return splits_response(get_document())
 
-    def event_stream():
-        """
-        Handle the stream of note updates, when the note index changes - push the update
-        otherwise just keep alive every 10s.
-        """
-        global notes
-        assert notes is not None
-
-        current_note_index = None
-        last_update = 0
-        client = get_client(settings.hostname, settings.port)
-        connected = client.connect()
-        # Note if the previous state was not connected
-        disconnected = True
-        # Define empty data, used to display the last notes even if disconnected
-        data = ""
 
-        while True:
-            if connected:
-                now = time.time()
-                try:
-                    new_index = max(client.get_split_index(), 0)
-                except (ConnectionError, TimeoutError):
-                    connected = client.connect()
-                    yield (
-                        f"data: <h2>Trying to connect to livesplit.</h2>"
-                        f"<h3>Make sure Livesplit server is running.</h3>{data}\n\n"
-                    )
-                else:
-                    if current_note_index != new_index or disconnected:
-                        disconnected = False
-
-                        last_update = now
-                        current_note_index = new_index
-                        split_text = notes.render_splits(
-                            new_index - settings.previous_splits,
-                            new_index + settings.next_splits + 1,
-                        )
-                        if len(split_text) > 0:
-                            # Remove newlines from the notes as they break the send
-                            data = "".join(split_text).replace("\n", "")
-                            yield f"data: {data}\n\n"
-                        else:
-                            yield "data: End of Notes.\n\n"
-                    elif now - last_update > KEEP_ALIVE:
-                        last_update = now
-                        yield ":No update, keep connection\n\n"
-            else:
-                disconnected = True
-                connected = client.connect()
-                yield (
-                    f"data: <h2>Trying to connect to livesplit.</h2>"
-                    f"<h3>Make sure Livesplit server is running.</h3>{data}\n\n"
-                )
-            time.sleep(0.5)
+@app.route("/n/<name>/")
+def named_notes_page(name):
+    """
+    Render the page for a specific notes file
+    """
+    return notes_response(get_document(name))
 
-    return Response(event_stream(), mimetype="text/event-stream")
 
+@app.route("/n/<name>/splits")
+def named_split(name):
+    """
+    Server-sent events for a specific notes file
+    """
+    return splits_response(get_document(name))
 
-@app.route("/<path:filename>")
-def serve_file(filename):
-    global notefile
-    assert isinstance(notefile, Path)
 
-    fld = notefile.parent
+@app.route("/search")
+def search():
+    """
+    Search the notes for ?q=words, returns matching splits as JSON
+    """
+    return search_response(get_document())
+
 
-    return send_from_directory(fld, filename)
+@app.route("/n/<name>/search")
+def named_search(name):
+    return search_response(get_document(name))
 
 
-def get_notes(parent):
-    global notes, notefile
+@app.route("/n/<name>/<path:filename>")
+def named_serve_file(name, filename):
+    return send_from_directory(get_document(name).path.parent, filename)
 
-    # noinspection PyTypeChecker
-    filepath, _ = QFileDialog.getOpenFileName(
-        parent,
-        "Open Notes",
-        settings.notes_folder,
-        "Note Files (*.txt *.md);;All Files (*.*)",
+
+@app.route("/metrics")
+def metrics_page():
+    """
+    Server metrics in the Prometheus text format
+    """
+    return Response(metrics.exposition(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/status")
+def status_page():
+    """
+    Server status and metrics as JSON
+    """
+    with pollers_lock:
+        poller_states = {
+            f"{hostname}:{port}": {
+                "connected": poller.state.connected,
+                "index": poller.state.index,
+                "subscribers": poller.subscribers,
+            }
+            for (hostname, port), poller in pollers.items()
+        }
+
+    return jsonify(
+        notefile=notefile.name if notefile else None,
+        documents={
+            name: {
+                "path": str(document.path),
+                "livesplit": "{}:{}".format(*document.livesplit),
+                "version": document.version,
+            }
+            for name, document in documents.items()
+        },
+        uptime=time.time() - start_time,
+        livesplit=f"{settings.hostname}:{settings.port}",
+        pollers=poller_states,
+        metrics=metrics.as_dict(),
+        latency=latency_stats.summary() if latency_enabled() else None,
     )
 
-    if filepath:
-        notefile = Path(filepath)
-        notes = Notes.from_file(notefile, settings.split_separator)
 
-        settings.notes_folder = str(notefile.parent)
-        settings.save()
-        return True
-    else:
-        return False
+@app.route("/<path:filename>")
+def serve_file(filename):
+    return send_from_directory(get_document().path.parent, filename)
@@ -0,0 +1,111 @@
+"""
+Close client connections that are stuck on a send.
+
+Waitress blocks a stream's thread with no timeout while a client is not
+reading, so the stream can't check how long a send is taking itself. The
+watchdog tracks a deadline for each send in progress on a single background
+thread and closes the connection if the send hasn't finished by then, which
+makes the blocked write fail and frees the thread.
+"""
+import itertools
+import socket
+import threading
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+
+
+class SendWatchdog:
+    """
+    Call a timeout function for any send that takes longer than its deadline.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        # token -> (deadline, function to call if the deadline passes)
+        self.deadlines: dict[int, tuple[float, Callable[[], None]]] = {}
+        self.tokens = itertools.count()
+        self.thread: threading.Thread | None = None
+
+    def start(self, timeout: float, on_timeout: Callable[[], None]) -> int:
+        """
+        Start watching a send
+
+        :param timeout: seconds the send may take
+        :param on_timeout: called from the watchdog thread if the send takes too long
+        :return: token to pass to finish when the send completes
+        """
+        with self.condition:
+            token = next(self.tokens)
+            self.deadlines[token] = (time.monotonic() + timeout, on_timeout)
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="send-watchdog", daemon=True
+                )
+                self.thread.start()
+            self.condition.notify()
+        return token
+
+    def finish(self, token: int) -> None:
+        with self.condition:
+            self.deadlines.pop(token, None)
+
+    @contextmanager
+    def deadline(self, timeout: float, on_timeout: Callable[[], None]):
+        """
+        Watch the send made in the body of the with block
+        """
+        token = self.start(timeout, on_timeout)
+        try:
+            yield
+        finally:
+            self.finish(token)
+
+    def run(self) -> None:
+        while True:
+            with self.condition:
+                now = time.monotonic()
+                expired = [
+                    token for token, (deadline, _) in self.deadlines.items()
+                    if deadline <= now
+                ]
+                timeouts = [self.deadlines.pop(token)[1] for token in expired]
+                if not timeouts:
+                    next_deadline = min(
+                        (deadline for deadline, _ in self.deadlines.values()),
+                        default=None,
+                    )
+                    self.condition.wait(
+                        None if next_deadline is None else next_deadline - now
+                    )
+                    continue
+
+            for on_timeout in timeouts:
+                on_timeout()
+
+
+def get_connection_closer(environ: dict) -> Callable[[], None] | None:
+    """
+    Get a function that closes the client connection of a WSGI request from
+    another thread, waking a server thread blocked writing to it.
+
+    :param environ: WSGI environ of the request
+    :return: function to close the connection, None if not served by waitress
+    """
+    # waitress only exposes its channel through this bound method
+    check_disconnected = environ.get("waitress.client_disconnected")
+    channel = getattr(check_disconnected, "__self__", None)
+    sock = getattr(channel, "socket", None)
+    if sock is None:
+        return None
+
+    def close():
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # Already closed
+        # The server loop sees the shut down socket, closes the channel
+        # and wakes the blocked writer
+        channel.server.pull_trigger()
+
+    return close
@@ -0,0 +1,232 @@
+"""
+Optional WebSocket transport for the split server.
+
+Carries the same notes as the /splits event stream, but browsers can also
+send messages to change their own offset from the current split and the
+number of splits shown. Requires the 'websockets' package.
+
+Messages from the server are JSON objects:
+    {"type": "notes", "connected": bool, "index": int, "offset": int, "html": str}
+    {"type": "error", "message": str}
+
+Messages from the browser are JSON objects:
+    {"type": "offset", "change": int}  - move the offset by change
+    {"type": "offset", "value": int}   - set the offset
+    {"type": "window", "previous": int, "next": int}  - splits to show around the current
+    {"type": "jump", "index": int}  - set the offset so the given split is shown
+"""
+import asyncio
+import json
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+from websockets.asyncio.server import serve as websocket_serve
+from websockets.exceptions import ConnectionClosed
+
+from . import split_server
+from .split_server import DISCONNECTED_MESSAGE, KEEP_ALIVE, NotesDocument, get_window
+
+websocket_clients = split_server.metrics.gauge(
+    "splitguides_websocket_clients", "Connected websocket clients"
+)
+websocket_messages = split_server.metrics.counter(
+    "splitguides_websocket_messages_total", "Messages received from websocket clients"
+)
+
+
+class ClientView:
+    """
+    Offset and window requested by a single websocket client
+    """
+
+    def __init__(
+        self,
+        previous_splits: int | None = None,
+        next_splits: int | None = None,
+    ):
+        self.offset = 0
+        self.previous_splits, self.next_splits = get_window(previous_splits, next_splits)
+        # Index of the current split before the offset, updated on each message
+        self.base_index = 0
+
+    def handle_message(self, message: dict) -> None:
+        """
+        Update the view from a client message
+
+        :param message: decoded JSON message
+        :raises ValueError: if the message is not understood
+        """
+        match message:
+            case {"type": "offset", "change": int(change)}:
+                self.offset += change
+            case {"type": "offset", "value": int(value)}:
+                self.offset = value
+            case {"type": "window", "previous": int(previous), "next": int(next_)}:
+                self.previous_splits, self.next_splits = get_window(previous, next_)
+            case {"type": "jump", "index": int(index)}:
+                self.offset = index - self.base_index
+            case _:
+                raise ValueError(f"Unrecognised message: {message!r}")
+
+
+def get_document(path: str) -> NotesDocument | None:
+    """
+    Get the notes document for a websocket request path, "/" or "/n/<name>/"
+    """
+    parts = [part for part in urlsplit(path).path.split("/") if part]
+    if not parts:
+        return split_server.root_document
+    elif len(parts) == 2 and parts[0] == "n":
+        return split_server.documents.get(parts[1])
+    return None
+
+
+def get_view(path: str) -> ClientView:
+    """
+    Get the initial view for a client from the ?previous=n&next=n query
+    """
+    query = parse_qs(urlsplit(path).query)
+    window = []
+    for key in ("previous", "next"):
+        try:
+            window.append(int(query[key][0]))
+        except (KeyError, ValueError):
+            window.append(None)
+    return ClientView(*window)
+
+
+def get_notes_message(document: NotesDocument, view: ClientView, data: str) -> dict:
+    """
+    Build the notes message for the current livesplit state
+
+    :param document: notes being shown
+    :param view: client offset and window
+    :param data: last notes html sent, shown under the message if disconnected
+    :return: message to send as JSON
+    """
+    state = split_server.get_poller(*document.livesplit).state
+    if state.connected:
+        view.base_index = document.get_index(state)
+        index = max(view.base_index + view.offset, 0)
+        html = document.render(index, view.previous_splits, view.next_splits)
+    else:
+        index = state.index
+        html = f"{DISCONNECTED_MESSAGE}{data}"
+
+    return {
+        "type": "notes",
+        "connected": state.connected,
+        "index": index,
+        "offset": view.offset,
+        "html": html,
+    }
+
+
+async def send_updates(
+    websocket,
+    document: NotesDocument,
+    view: ClientView,
+    changed: asyncio.Event,
+):
+    """
+    Send the notes to the client whenever livesplit, the notes or the view change
+    """
+    last_message = None
+    data = ""
+    poller = split_server.get_poller(*document.livesplit)
+    try:
+        # Don't send a disconnected message before livesplit has been polled
+        await asyncio.to_thread(poller.wait_for_change, None, KEEP_ALIVE)
+
+        while True:
+            await changed.wait()
+            changed.clear()
+
+            # Rendering can wait on the document lock, keep it off the event loop
+            message = await asyncio.to_thread(get_notes_message, document, view, data)
+            if message == last_message:
+                continue
+            if message["connected"]:
+                data = message["html"]
+
+            await websocket.send(json.dumps(message))
+            last_message = message
+    except ConnectionClosed:
+        pass
+
+
+async def handle_client(websocket):
+    document = get_document(websocket.request.path)
+    if document is None:
+        await websocket.close(code=1008, reason="Notes not found")
+        return
+
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+    changed.set()
+
+    def wake():
+        loop.call_soon_threadsafe(changed.set)
+
+    view = get_view(websocket.request.path)
+    poller = split_server.get_poller(*document.livesplit)
+    split_server.start_notes_watcher()
+    poller.add_listener(wake)
+    poller.subscribe()
+    websocket_clients.inc()
+
+    sender = asyncio.create_task(send_updates(websocket, document, view, changed))
+    try:
+        async for raw_message in websocket:
+            websocket_messages.inc()
+            try:
+                view.handle_message(json.loads(raw_message))
+            except ValueError as e:
+                await websocket.send(json.dumps({"type": "error", "message": str(e)}))
+            else:
+                changed.set()
+    except ConnectionClosed:
+        pass
+    finally:
+        sender.cancel()
+        websocket_clients.dec()
+        poller.unsubscribe()
+        poller.remove_listener(wake)
+
+
+async def serve_websockets(host: str, port: int, started: threading.Event | None = None):
+    async with websocket_serve(handle_client, host, port):
+        if started:
+            started.set()
+        await asyncio.Future()  # Run until the thread is stopped
+
+
+def start_websocket_server(host: str, port: int) -> threading.Thread:
+    """
+    Run the websocket server on its own event loop in a background thread.
+
+    :param host: hostname to serve on
+    :param port: port to serve on
+    :return: the server thread
+    :raises OSError: if the server could not be started, eg: the port is in use
+    """
+    started = threading.Event()
+    errors: list[BaseException] = []
+
+    def run():
+        try:
+            asyncio.run(serve_websockets(host, port, started))
+        except BaseException as e:
+            errors.append(e)
+            started.set()
+
+    thread = threading.Thread(target=run, name="websocket-server", daemon=True)
+    thread.start()
+
+    if not started.wait(timeout=5):
+        raise OSError(f"Timed out starting the websocket server on port {port}")
+    if errors:
+        raise OSError(
+            f"Could not start the websocket server on port {port}: {errors[0]}"
+        ) from errors[0]
+    return thread
@@ -34,6 +34,10 @@ match sys.platform:
 
 SETTINGS_FOLDER.mkdir(exist_ok=True)
 
+# Compiled jinja2 templates are cached here between launches
+TEMPLATE_CACHE_FOLDER = SETTINGS_FOLDER / "template_cache"
+TEMPLATE_CACHE_FOLDER.mkdir(exist_ok=True)
+
 if getattr(sys, "frozen", False):  # pragma: nocover
     # Application is .exe, use visible files
     APPLICATION_FOLDER = Path(sys.executable).parent
@@ -76,6 +80,8 @@ class BaseSettings(metaclass=ABCMeta):
 
     # Parser Settings
     split_separator: str = ""
+    # Match notes to splits by [split: Name] headers where available
+    split_name_matching: bool = False
 
     # Display Settings
     previous_splits: int = 0
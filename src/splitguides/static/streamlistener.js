@@ -1,18 +1,117 @@
 // This is the code to listen to server events sent by flask.
+// If the server has websockets enabled they are used instead so the
+// offset can be changed from the browser.
 
 const splits = document.getElementById("splits")
-const evtSource = new EventSource("splits")
+const websocketPort = document.body.dataset.websocketPort
 
 splits.innerHTML = "<strong>Loading...</strong>"
 
-console.log(evtSource)
+function listenEventSource() {
+  // Pass on ?previous=n&next=n to choose the number of splits shown
+  const evtSource = new EventSource("splits" + window.location.search)
 
-evtSource.onmessage = function(e) {
-  if (e.data) {
-    splits.innerHTML = e.data
+  console.log(evtSource)
+
+  evtSource.onmessage = function(e) {
+    if (e.data) {
+      splits.innerHTML = e.data
+    }
+  }
+
+  evtSource.onerror = function(err) {
+    console.error("EventSource failed:", err)
+  }
+}
+
+// Offset is kept here so it can be restored if the websocket reconnects
+let offset = 0
+// Websocket attempts that closed without connecting since the last connection
+let failedAttempts = 0
+let websocketConnected = false
+// Failed reconnects before giving up on websockets and using the event stream
+const maxFailedAttempts = 3
+// Index of the split being shown, search jumps to the next match after it
+let shownIndex = 0
+
+async function findSplit(socket) {
+  const query = window.prompt("Find in notes")
+  if (!query) {
+    return
+  }
+  const response = await fetch("search?q=" + encodeURIComponent(query))
+  const results = (await response.json()).results
+  if (results.length === 0) {
+    window.alert(`No splits found for "${query}"`)
+    return
+  }
+  const next = results.find((result) => result.index > shownIndex) || results[0]
+  socket.send(JSON.stringify({type: "jump", index: next.index}))
+}
+
+function listenWebSocket() {
+  const protocol = window.location.protocol === "https:" ? "wss:" : "ws:"
+  const socket = new WebSocket(
+    `${protocol}//${window.location.hostname}:${websocketPort}` +
+    `${window.location.pathname}${window.location.search}`
+  )
+
+  let opened = false
+
+  socket.onopen = function() {
+    opened = true
+    websocketConnected = true
+    failedAttempts = 0
+    if (offset !== 0) {
+      socket.send(JSON.stringify({type: "offset", value: offset}))
+    }
+  }
+
+  socket.onmessage = function(e) {
+    const message = JSON.parse(e.data)
+    if (message.type === "notes") {
+      offset = message.offset
+      shownIndex = message.index
+      splits.innerHTML = message.html
+    } else if (message.type === "error") {
+      console.error("Websocket error:", message.message)
+    }
+  }
+
+  socket.onclose = function() {
+    if (!opened) {
+      failedAttempts += 1
+    }
+    // Fall back to the event stream if the websocket server isn't running
+    if (!websocketConnected || failedAttempts >= maxFailedAttempts) {
+      console.error("Websocket unavailable, using the event stream")
+      window.onkeydown = null
+      listenEventSource()
+      return
+    }
+    // Reconnect after the same delay the event stream uses
+    setTimeout(listenWebSocket, 1000)
+  }
+
+  window.onkeydown = function(e) {
+    if (socket.readyState !== WebSocket.OPEN) {
+      return
+    }
+    if (e.key === "+" || e.key === "=" || e.key === "ArrowRight") {
+      socket.send(JSON.stringify({type: "offset", change: 1}))
+    } else if (e.key === "-" || e.key === "ArrowLeft") {
+      socket.send(JSON.stringify({type: "offset", change: -1}))
+    } else if (e.key === "0") {
+      socket.send(JSON.stringify({type: "offset", value: 0}))
+    } else if (e.key === "/" || e.key === "f") {
+      e.preventDefault()
+      findSplit(socket)
+    }
   }
 }
 
-evtSource.onerror = function(err) {
-  console.error("EventSource failed:", err)
+if (websocketPort && "WebSocket" in window) {
+  listenWebSocket()
+} else {
+  listenEventSource()
 }
@@ -0,0 +1,182 @@
+"""
+Lightweight tracing of the note update path.
+
+Tracing is off by default, in which case `span` returns a shared do-nothing
+context manager. When enabled, spans are recorded into a ring buffer and
+can be written out in the Chrome trace event format (viewable in
+chrome://tracing or https://ui.perfetto.dev). Counters record values such as
+sizes at a point in time and are shown as graphs alongside the spans.
+
+Set the environment variable SPLITGUIDES_TRACE to a file path to record a
+trace for the whole session and write it on exit.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+TRACE_ENV = "SPLITGUIDES_TRACE"
+DEFAULT_BUFFER_SIZE = 100_000
+
+_enabled = False
+_buffer: deque = deque(maxlen=DEFAULT_BUFFER_SIZE)
+_counters: deque = deque(maxlen=DEFAULT_BUFFER_SIZE)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    Record the time taken for the enclosed block
+    """
+    __slots__ = ("name", "category", "start")
+
+    def __init__(self, name: str, category: str):
+        self.name = name
+        self.category = category
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end = time.perf_counter_ns()
+        _buffer.append(
+            (self.name, self.category, self.start, end - self.start, threading.get_ident())
+        )
+        return False
+
+
+def span(name: str, category: str = "splitguides"):
+    """
+    Get a context manager that records a span if tracing is enabled.
+
+    :param name: name of the traced operation
+    :param category: trace category
+    :return: context manager
+    """
+    if not _enabled:
+        return NULL_SPAN
+    return Span(name, category)
+
+
+def counter(name: str, category: str = "splitguides", **values: int | float) -> None:
+    """
+    Record counter values if tracing is enabled.
+
+    :param name: name of the counter
+    :param category: trace category
+    :param values: named values to record
+    """
+    if _enabled:
+        _counters.append(
+            (name, category, time.perf_counter_ns(), values, threading.get_ident())
+        )
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable(buffer_size: int = DEFAULT_BUFFER_SIZE) -> None:
+    """
+    Start recording spans, keeping the most recent buffer_size spans.
+    """
+    global _enabled, _buffer, _counters
+    if _buffer.maxlen != buffer_size:
+        _buffer = deque(_buffer, maxlen=buffer_size)
+        _counters = deque(_counters, maxlen=buffer_size)
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def clear() -> None:
+    _buffer.clear()
+    _counters.clear()
+
+
+def get_spans() -> list[tuple[str, str, int, int, int]]:
+    """
+    :return: list of recorded spans as (name, category, start_ns, duration_ns, thread id)
+    """
+    return list(_buffer)
+
+
+def get_counters() -> list[tuple[str, str, int, dict, int]]:
+    """
+    :return: list of recorded counters as (name, category, time_ns, values, thread id)
+    """
+    return list(_counters)
+
+
+def chrome_trace() -> dict:
+    """
+    Get the recorded spans as a Chrome trace event format dictionary
+    """
+    pid = os.getpid()
+    events = [
+        {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start / 1000,
+            "dur": duration / 1000,
+            "pid": pid,
+            "tid": tid,
+        }
+        for name, category, start, duration, tid in list(_buffer)
+    ]
+    events.extend(
+        {
+            "name": name,
+            "cat": category,
+            "ph": "C",
+            "ts": timestamp / 1000,
+            "pid": pid,
+            "tid": tid,
+            "args": values,
+        }
+        for name, category, timestamp, values, tid in list(_counters)
+    )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def dump_chrome_trace(path: str | os.PathLike) -> None:
+    """
+    Write the recorded spans to a Chrome trace JSON file.
+    """
+    Path(path).write_text(json.dumps(chrome_trace()))
+
+
+def enable_from_environment() -> bool:
+    """
+    Enable tracing if SPLITGUIDES_TRACE is set, writing the trace to that path on exit.
+
+    :return: True if tracing was enabled
+    """
+    trace_path = os.environ.get(TRACE_ENV)
+    if not trace_path:
+        return False
+
+    enable()
+    atexit.register(dump_chrome_trace, trace_path)
+    return True
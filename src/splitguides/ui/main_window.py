@@ -4,14 +4,15 @@ Define the main windows for the desktop application
 from __future__ import annotations
 
 import sys
+import threading
 import time
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor
 
-from jinja2 import Environment, FileSystemLoader, Template
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
 from PySide6 import QtCore
 from PySide6.QtGui import QColorConstants, QCursor, QIcon, QMouseEvent, QAction
-from PySide6.QtWidgets import QMainWindow, QFileDialog, QMenu, QErrorMessage
+from PySide6.QtWidgets import QMainWindow, QFileDialog, QInputDialog, QMenu, QErrorMessage
 from PySide6.QtWebEngineCore import QWebEngineSettings
 
 from .color import rgba_to_qss
@@ -20,9 +21,19 @@ from .hotkey_manager import HotkeyManager
 from .layouts import Ui_MainWindow
 from .settings_ui import SettingsDialog
 
-from ..livesplit_client import get_client, LivesplitMessaging
+from .. import tracing
+from ..assets import PRELOAD_SPLITS, AssetPipeline
+from ..latency import LatencyStats, LatencyTracker, latency_enabled
+from ..livesplit_client import (
+    get_client,
+    LivesplitMessaging,
+    SplitEvent,
+    SplitEventType,
+    SplitWatcher,
+)
 from ..note_parser import Notes
-from ..settings import DesktopSettings
+from ..renderer import PageShell
+from ..settings import DesktopSettings, TEMPLATE_CACHE_FOLDER
 
 
 # Get correct paths
@@ -57,14 +68,18 @@ class MainWindow(QMainWindow):
 
     notefile: None | str
     notes: None | Notes
+    assets: None | AssetPipeline
 
     j2_environment: Environment
 
     template: Template
+    shell: PageShell
     css: str
 
     client: LivesplitMessaging
     ls: LivesplitLink
+    renderer: NoteRenderer
+    latency: LatencyTracker
 
     split_index: int
     split_offset: int
@@ -98,6 +113,7 @@ class MainWindow(QMainWindow):
         # Setup notes variables
         self.notefile = None
         self.notes = None
+        self.assets = None
 
         # Build the right click menu
         # Creates rc_menu, menu_on_top, menu_transparency, hotkeys_toggle
@@ -121,11 +137,18 @@ class MainWindow(QMainWindow):
 
         self.j2_environment = Environment(
             loader=FileSystemLoader(self.settings.html_template_folder),
+            bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE_FOLDER),
             autoescape=False,
         )
 
-        self.load_template()  # sets self.template
         self.load_css()  # sets self.css
+        self.load_template()  # sets self.template and self.shell - uses self.css
+
+        # Split to display latency measurement, only active if enabled
+        self.latency = LatencyTracker(LatencyStats(), enabled=latency_enabled())
+        self.ui.notes.loadFinished.connect(self.notes_loaded)
+
+        self.renderer = NoteRenderer(self)
 
         self.render_blank()
 
@@ -214,29 +237,52 @@ class MainWindow(QMainWindow):
             self.split_offset = 0  # Reset the offset as you can no longer change it
             if not self.ls.connected:
                 self.update_notes(0)
+            else:
+                self.update_notes(self.ls.split_index)
 
     def increase_offset(self):
-        self.split_offset += 1
-        # Rerender if not connected (if connected this will happen automatically)
-        if not self.ls.connected:
-            self.update_notes(0)
-            self.ui.statusbar.showMessage(
-                f"Trying to connect to Livesplit. | Split Offset: {self.split_offset}"
-            )
-        else:
-            self.ui.statusbar.showMessage(
-                f"Connected to Livesplit. | Split Offset: {self.split_offset}"
-            )
+        self.set_offset(self.split_offset + 1)
 
     def decrease_offset(self):
-        self.split_offset -= 1
-        # Rerender if not connected (if connected this will happen automatically)
+        self.set_offset(self.split_offset - 1)
+
+    def find_in_notes(self):
+        """Ask for words to search for and jump to the next split containing them."""
+        if not self.notes:
+            return
+
+        query, ok = QInputDialog.getText(self, "Find in Notes", "Find:")
+        if not (ok and query):
+            return
+
+        results = self.notes.search(query)
+        if not results:
+            self.ui.statusbar.showMessage(f"No splits found for '{query}'")
+            return
+
+        # Go to the next match after the split being shown, wrapping to the start
+        target = next((idx for idx in results if idx > self.split_index), results[0])
+        self.jump_to_split(target)
+
+    def jump_to_split(self, target):
+        """
+        Set the offset so the given split is shown.
+
+        :param target: index of the split in the notes
+        """
+        split_index = max(self.ls.split_index, 0) if self.ls.connected else 0
+        self.set_offset(target - split_index)
+
+    def set_offset(self, offset):
+        self.split_offset = offset
+        # Rerender with the new offset
         if not self.ls.connected:
             self.update_notes(0)
             self.ui.statusbar.showMessage(
                 f"Trying to connect to Livesplit. | Split Offset: {self.split_offset}"
             )
         else:
+            self.update_notes(self.ls.split_index)
             self.ui.statusbar.showMessage(
                 f"Connected to Livesplit. | Split Offset: {self.split_offset}"
             )
@@ -257,8 +303,15 @@ class MainWindow(QMainWindow):
         if sys.platform == "win32":
             self.hotkey_manager.disable_all()  # Kill any hotkeys
         self.ls.close()
+        self.renderer.close()
+        if self.latency.enabled:
+            print(f"Split to display latency:\n{self.latency.stats.format_summary()}")
         event.accept()
 
+    def notes_loaded(self, ok):
+        """The notes view has finished loading the new HTML."""
+        self.latency.mark("display", finish=True)
+
     def resizeEvent(self, event):
         """Store the new window height and width to keep it between launches."""
         self.settings.width = self.width()
@@ -287,6 +340,9 @@ class MainWindow(QMainWindow):
         open_notes = self.rc_menu.addAction("Open Notes")
         open_notes.triggered.connect(self.open_notes)
 
+        find_in_notes = self.rc_menu.addAction("Find in Notes")
+        find_in_notes.triggered.connect(self.find_in_notes)
+
         open_settings = self.rc_menu.addAction("Settings")
         open_settings.triggered.connect(self.open_settings)
 
@@ -318,10 +374,24 @@ class MainWindow(QMainWindow):
         self.rc_menu.popup(QCursor.pos())
 
     def load_template(self):
-        """Load the HTML template for the split rendering."""
+        """
+        Load the HTML template for the split rendering.
+
+        The CSS and font settings are bound to the template here and the
+        static parts of the page are rendered once, each update only needs
+        to provide the notes.
+        """
         self.template = self.j2_environment.get_template(
-            str(self.settings.html_template_file)
+            str(self.settings.html_template_file),
+            globals={
+                "font_size": self.settings.font_size,
+                "font_color": self.settings.font_color,
+                "bg_color": "transparent",
+                "css": self.css,
+            },
         )
+        # Pre-render the static parts of the page
+        self.shell = PageShell(self.template)
 
     def load_css(self):
         """Read the CSS file into memory."""
@@ -333,7 +403,7 @@ class MainWindow(QMainWindow):
             self,
             "Open Notes",
             self.settings.notes_folder,
-            "Note Files (*.txt *.md *.html);;All Files (*.*)",
+            "Note Files (*.txt *.md *.html *.sgnotes);;All Files (*.*)",
         )
 
         if notefile:
@@ -344,20 +414,19 @@ class MainWindow(QMainWindow):
             )
             # Remember this notes folder next time notes are loaded.
             self.settings.notes_folder = str(Path(notefile).parent)
+            self.assets = AssetPipeline(Path(notefile).parent)
             # Reset the split offset
             self.split_offset = 0
 
-            self.update_notes(idx=0, refresh=True)
+            # Show the current split if livesplit is already running
+            idx = self.ls.split_index if self.ls.connected else 0
+            self.update_notes(idx=idx, refresh=True)
 
     def render_blank(self):
         """Render the initial blank template."""
-        html = self.template.render(
-            font_size=self.settings.font_size,
-            font_color=self.settings.font_color,
-            bg_color="transparent",
-            css=self.css,
-            notes=["<h1>Right Click to Load Notes</h1>"],
-        )
+        # Make sure a render still in progress does not replace this
+        self.renderer.cancel()
+        html = self.shell.render(["<h1>Right Click to Load Notes</h1>"])
         self.ui.notes.setHtml(html)
 
     def update_notes(self, idx, refresh=False):
@@ -377,17 +446,13 @@ class MainWindow(QMainWindow):
             start = idx - self.settings.previous_splits
             end = idx + self.settings.next_splits + 1
 
-            html = self.template.render(
-                font_size=self.settings.font_size,
-                font_color=self.settings.font_color,
-                bg_color="transparent",
-                css=self.css,
-                notes=self.notes.render_splits(start, end),
-            )
-
             note_uri = Path(self.notefile).absolute().as_uri()
 
-            self.ui.notes.setHtml(html, baseUrl=note_uri)
+            # Rendering happens on the renderer thread, the result is sent
+            # back to be displayed when it is ready.
+            self.renderer.request(
+                self.notes, self.shell, start, end, note_uri, assets=self.assets
+            )
             self.split_index = idx
 
     def open_settings(self):
@@ -411,15 +476,24 @@ class MainWindow(QMainWindow):
                 self.client = get_client(self.settings.hostname, self.settings.port)
                 self.ls = LivesplitLink(self.client, self)
                 self.ls.start_loops()
+            else:
+                self.ls.watcher.track_names = self.settings.split_name_matching
 
             # Redraw transparency settings (colours may have changed)
             self.refresh_transparency()
 
+            # Reload the template and CSS as the files or font settings may have changed
+            self.j2_environment.loader = FileSystemLoader(self.settings.html_template_folder)
+            self.load_css()
+            self.load_template()
+
             # Reread notes with separator
             if self.notefile:
                 self.notes = Notes.from_file(
                     self.notefile, separator=self.settings.split_separator
                 )
+                # Images may have been edited along with the notes
+                self.assets = AssetPipeline(Path(self.notefile).parent)
                 # Reset the offset
                 self.split_offset = 0
                 self.update_notes(self.split_index, refresh=True)
@@ -436,6 +510,99 @@ class MainWindow(QMainWindow):
                 self.hotkeys_toggle.setChecked(False)
 
 
+class NoteRenderer(QtCore.QObject):
+    """
+    Render notes on a worker thread and send the finished HTML to the main window.
+
+    At most one render runs at a time. Requests made while a render is running
+    replace any earlier request that has not started, and renders that finish
+    after a newer request are discarded.
+    """
+
+    html_signal = QtCore.Signal(str, str, int)
+
+    def __init__(self, main_window):
+        super().__init__()
+        self.main_window = main_window  # type: MainWindow
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.pending = None
+        self.running = False
+        # Requests replaced before they were rendered
+        self.dropped_count = 0
+        # One worker - the markdown processors are not thread safe
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        # noinspection PyUnresolvedReferences
+        self.html_signal.connect(self.show_html)
+
+    def request(self, notes, shell, start, end, base_url, assets=None):
+        """
+        Render the splits from start to end, replacing any earlier request.
+
+        :param notes: Notes instance to render
+        :param shell: PageShell to place the rendered notes in
+        :param start: Split index to start rendering
+        :param end: Split index to end rendering
+        :param base_url: Base URL for relative links in the notes
+        :param assets: AssetPipeline to inline images and read ahead upcoming splits
+        """
+        with self.lock:
+            self.generation += 1
+            if self.pending:
+                self.dropped_count += 1
+            self.pending = (self.generation, notes, shell, start, end, base_url, assets)
+            if self.running:
+                # The running render loop will pick up the new request
+                return
+            self.running = True
+        self.pool.submit(self.render_loop)
+
+    def cancel(self):
+        """Discard any render in progress or waiting."""
+        with self.lock:
+            self.generation += 1
+            self.pending = None
+
+    def close(self):
+        self.cancel()
+        self.pool.shutdown(wait=False)
+
+    def take_pending(self):
+        with self.lock:
+            job, self.pending = self.pending, None
+            if job is None:
+                self.running = False
+            return job
+
+    def render_loop(self):
+        """Render requests until there are none waiting."""
+        try:
+            while job := self.take_pending():
+                generation, notes, shell, start, end, base_url, assets = job
+                splits = notes.render_splits(start, end)
+                if assets:
+                    splits = assets.process(splits)
+                html = shell.render(splits)
+                if generation == self.generation:
+                    self.main_window.latency.mark("render")
+                    # noinspection PyUnresolvedReferences
+                    self.html_signal.emit(html, base_url, generation)
+                if assets:
+                    # Read the images for the next splits while waiting for the next request
+                    assets.warm(notes.notes[max(end, 0):max(end, 0) + PRELOAD_SPLITS])
+        except BaseException:
+            with self.lock:
+                self.running = False
+            raise
+
+    def show_html(self, html, base_url, generation):
+        # A newer request may have been made after this render finished
+        if generation == self.generation:
+            with tracing.span("webengine.setHtml", "render"):
+                self.main_window.ui.notes.setHtml(html, baseUrl=base_url)
+            self.main_window.latency.mark("set_html")
+
+
 class LivesplitLink(QtCore.QObject):
     """
     Handle the thread running the livesplit connection and linking to the main window.
@@ -448,11 +615,24 @@ class LivesplitLink(QtCore.QObject):
         super().__init__()
         self.client = client
         self.main_window = main_window  # type: MainWindow
+        self.watcher = SplitWatcher(
+            client, track_names=main_window.settings.split_name_matching
+        )
         self.connected = False
+        self.split_index = 0
         self.break_loop = False
         self.pool = None
+
+        # Only one index signal is waiting to be handled at a time
+        # later indices replace the waiting value
+        self.lock = threading.Lock()
+        self.index_pending = False
+
+        # Index and offset of the last signal, signals are only sent on change
+        self.last_state = None
+        self.emit_count = 0
         # noinspection PyUnresolvedReferences
-        self.note_signal.connect(self.main_window.update_notes)
+        self.note_signal.connect(self.deliver_index)
 
     def start_loops(self):
         self.break_loop = False
@@ -471,31 +651,62 @@ class LivesplitLink(QtCore.QObject):
     def update_status(self, message):
         self.main_window.ui.statusbar.showMessage(message)
 
-    def ls_connect(self):
-        self.update_status(
-            f"Trying to connect to Livesplit. | "
-            f"Split Offset: {self.main_window.split_offset}"
-        )
-        self.connected = self.client.connect()
-        if self.connected:
+    def handle_event(self, event: SplitEvent):
+        """
+        Update the connection status and send the new index to the main window.
+        """
+        if event.kind == SplitEventType.DISCONNECTED:
+            self.connected = False
+            self.update_status(
+                f"Trying to connect to Livesplit. | "
+                f"Split Offset: {self.main_window.split_offset}"
+            )
+            return
+
+        if event.kind == SplitEventType.CONNECTED:
+            self.connected = True
             self.update_status(
                 f"Connected to Livesplit. | "
                 f"Split Offset: {self.main_window.split_offset}"
             )
 
+        split_index = event.index
+        notes = self.main_window.notes
+        if notes and self.main_window.settings.split_name_matching:
+            split_index = notes.lookup_index(split_index, event.name)
+
+        state = (split_index, self.main_window.split_offset)
+
+        with self.lock:
+            self.split_index = split_index
+            if state == self.last_state:
+                return
+            self.last_state = state
+            # Start timing from when the change was seen
+            self.main_window.latency.observe(event.observed)
+            if self.index_pending:
+                # The waiting signal will pick up the new index
+                return
+            self.index_pending = True
+
+        # Send the signal to the main window to update.
+        self.emit_count += 1
+        # noinspection PyUnresolvedReferences
+        self.note_signal.emit(split_index)
+
+    def deliver_index(self, _):
+        """Update the main window with the most recent index."""
+        with self.lock:
+            self.index_pending = False
+            split_index = self.split_index
+        self.main_window.update_notes(split_index)
+
     def loop_update_split(self):
+        self.update_status(
+            f"Trying to connect to Livesplit. | "
+            f"Split Offset: {self.main_window.split_offset}"
+        )
         while not self.break_loop:
-            # If not connected attempt to connect
-            if self.connected:
-                try:
-                    split_index = self.client.get_split_index()
-                except (ConnectionError, TimeoutError):
-                    self.connected = False
-                    self.client.close()
-                else:
-                    # Send the signal to the main window to update.
-                    # noinspection PyUnresolvedReferences
-                    self.note_signal.emit(split_index)
-            else:
-                self.ls_connect()
+            for event in self.watcher.poll():
+                self.handle_event(event)
             time.sleep(0.1)
@@ -12,6 +12,7 @@ from PySide6.QtGui import (
 )
 
 from ..settings import ServerSettings
+from ..server.split_server import add_notes
 from .color import rgba_to_qcolor, qcolor_to_rgba
 from .layouts import Ui_ServerSettings
 
@@ -189,3 +190,30 @@ class ServerSettingsDialog(QDialog):
         super().accept()
         # Store the settings in the settings object
         self.store_settings()
+
+
+def get_notes(parent, settings: ServerSettings):
+    """
+    Ask for one or more notes files to serve.
+
+    :param parent: parent widget for the file dialog
+    :param settings: server settings, the notes folder is updated and saved
+    :return: True if any notes were selected
+    """
+    # noinspection PyTypeChecker
+    filepaths, _ = QFileDialog.getOpenFileNames(
+        parent,
+        "Open Notes",
+        settings.notes_folder,
+        "Note Files (*.txt *.md *.sgnotes);;All Files (*.*)",
+    )
+
+    if filepaths:
+        for filepath in filepaths:
+            add_notes(filepath)
+
+        settings.notes_folder = str(Path(filepaths[0]).parent)
+        settings.save()
+        return True
+    else:
+        return False
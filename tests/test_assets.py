@@ -0,0 +1,130 @@
+import base64
+import os
+
+from splitguides.assets import AssetPipeline, find_media, is_local, preload_links
+
+png_data = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+png_uri = f"data:image/png;base64,{base64.b64encode(png_data).decode('ascii')}"
+
+
+def test_is_local():
+    assert is_local("images/chest.png")
+    assert not is_local("https://example.com/chest.png")
+    assert not is_local("/static/chest.png")
+    assert not is_local("#section")
+    assert not is_local("data:image/png;base64,AAAA")
+
+
+def test_find_media():
+    rendered = (
+        '<img alt="chest" src="images/chest.png">'
+        '<img src="https://example.com/remote.png">'
+        '<video controls src="clips/skip.mp4"></video>'
+        '<a href="images/linked.png">link</a>'
+    )
+    assert find_media(rendered) == [("img", "images/chest.png"), ("video", "clips/skip.mp4")]
+
+
+def test_preload_links():
+    links = preload_links([
+        '<img src="images/chest.png"><img src="images/chest.png">',
+        '<video src="clips/skip&amp;jump.mp4"></video>',
+    ])
+    assert links == (
+        '<link rel="preload" as="image" href="images/chest.png">'
+        '<link rel="prefetch" href="clips/skip&amp;jump.mp4">'
+    )
+
+
+def test_process_inlines_small_images(tmp_path):
+    (tmp_path / "images").mkdir()
+    (tmp_path / "images" / "chest.png").write_bytes(png_data)
+    (tmp_path / "images" / "large.png").write_bytes(png_data + b"\0" * 100)
+    (tmp_path / "notes.txt").write_text("not an image")
+
+    pipeline = AssetPipeline(tmp_path, inline_limit=len(png_data))
+
+    assert pipeline.process(['<img alt="chest" src="images/chest.png">']) == [
+        f'<img alt="chest" src="{png_uri}">'
+    ]
+
+    # Large files, missing files and other types are left to be fetched
+    for rendered in [
+        '<img src="images/large.png">',
+        '<img src="images/missing.png">',
+        '<img src="notes.txt">',
+        '<video src="images/chest.png"></video>',
+    ]:
+        assert pipeline.process([rendered]) == [rendered]
+
+
+def test_process_outside_folder(tmp_path):
+    (tmp_path / "secret.png").write_bytes(png_data)
+    (tmp_path / "notes").mkdir()
+
+    pipeline = AssetPipeline(tmp_path / "notes")
+
+    rendered = '<img src="../secret.png">'
+    assert pipeline.process([rendered]) == [rendered]
+
+
+def test_process_disabled(tmp_path):
+    (tmp_path / "chest.png").write_bytes(png_data)
+
+    pipeline = AssetPipeline(tmp_path, inline_limit=0)
+
+    assert pipeline.process(['<img src="chest.png">']) == ['<img src="chest.png">']
+
+
+def test_warm_caches_until_changed(tmp_path):
+    image = tmp_path / "chest.png"
+    image.write_bytes(png_data)
+
+    pipeline = AssetPipeline(tmp_path)
+    pipeline.warm(["Grab the chest ![chest](chest.png)", '<img src="missing.png">'])
+
+    assert pipeline.cache == {
+        image.resolve(): (image.stat().st_mtime_ns, png_uri),
+        (tmp_path / "missing.png").resolve(): (None, None),
+    }
+
+    # A changed file is read again
+    image.write_bytes(b"not a png")
+    mtime = image.stat().st_mtime_ns + 1_000_000
+    os.utime(image, ns=(mtime, mtime))
+
+    assert pipeline.get_data_uri("chest.png") == "data:image/png;base64,bm90IGEgcG5n"
+
+
+def test_process_page_limit(tmp_path):
+    (tmp_path / "first.png").write_bytes(png_data)
+    (tmp_path / "second.png").write_bytes(png_data)
+
+    # Only room for one image in the page
+    pipeline = AssetPipeline(tmp_path, page_limit=len(png_uri) + 10)
+
+    assert pipeline.process(['<img src="first.png">', '<img src="second.png">']) == [
+        f'<img src="{png_uri}">',
+        '<img src="second.png">',
+    ]
+    # The limit is for each page
+    assert pipeline.process(['<img src="second.png">']) == [f'<img src="{png_uri}">']
+
+
+def test_check_for_changes(tmp_path):
+    image = tmp_path / "chest.png"
+    image.write_bytes(png_data)
+
+    pipeline = AssetPipeline(tmp_path)
+    pipeline.process(['<img src="chest.png">', '<img src="new.png">'])
+    assert not pipeline.check_for_changes()
+
+    (tmp_path / "new.png").write_bytes(png_data)
+    assert pipeline.check_for_changes()
+    assert not pipeline.check_for_changes()
+
+    image.unlink()
+    assert pipeline.check_for_changes()
+    assert pipeline.process(['<img src="chest.png">']) == ['<img src="chest.png">']
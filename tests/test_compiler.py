@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from splitguides.compiler import compile_notes, find_assets, load_bundle, main
+from splitguides.exceptions import NotesBundleError
+from splitguides.note_parser import Notes
+
+notes_text = """\
+[split: Asylum Demon]
+Grab the **key**
+![map](images/map.png)
+
+[split: Taurus Demon]
+Plunge attack
+[Link](https://example.com)
+"""
+
+
+@pytest.fixture(scope="function")
+def notes_file(tmp_path):
+    notes_path = tmp_path / "route.md"
+    notes_path.write_text(notes_text)
+    return notes_path
+
+
+def test_find_assets():
+    html = (
+        '<img src="images/map.png"><a href="https://example.com">x</a>'
+        '<video src="clips/skip.mp4?t=1"></video><img src="images/map.png">'
+    )
+    assert find_assets(html) == ["images/map.png", "clips/skip.mp4"]
+
+
+def test_compile_and_load(notes_file, monkeypatch):
+    bundle_path = compile_notes(notes_file)
+    assert bundle_path == notes_file.with_suffix(".sgnotes")
+
+    header = json.loads(bundle_path.read_text().splitlines()[0])
+    assert header["split_count"] == 2
+    assert header["assets"] == ["images/map.png"]
+
+    original = Notes.from_file(notes_file)
+    original_html = original.render_splits(0, 3)
+
+    # Loading the bundle must not need the markdown processor
+    monkeypatch.setattr("splitguides.note_parser.MarkdownProcessor.process", None)
+    compiled = Notes.from_file(bundle_path)
+
+    assert compiled.notes == original.notes
+    assert compiled.split_names == original.split_names
+    assert list(compiled.index.hashes) == list(original.index.hashes)
+    assert list(compiled.index.starts) == list(original.index.starts)
+    assert compiled.render_splits(0, 3) == original_html
+    assert compiled.lookup_index(0, "Taurus Demon") == 1
+    assert compiled.search("plunge") == [1]
+
+
+def test_bundle_sanitised_on_load(notes_file):
+    bundle_path = compile_notes(notes_file)
+    lines = bundle_path.read_text().splitlines()
+    split = json.loads(lines[1])
+    split["html"] = "<script>alert('hi')</script>"
+    lines[1] = json.dumps(split)
+    bundle_path.write_text("\n".join(lines))
+
+    assert "<script>" not in load_bundle(bundle_path).render_splits(0, 1)[0]
+
+
+@pytest.mark.parametrize(
+    "contents",
+    [
+        "not json",
+        json.dumps({"format": "other"}),
+        json.dumps({"format": "splitguides-notes", "version": 99}),
+        json.dumps({"format": "splitguides-notes", "version": 1, "split_count": 2}),
+    ],
+)
+def test_invalid_bundle(tmp_path, contents):
+    bundle_path = tmp_path / "bad.sgnotes"
+    bundle_path.write_text(contents + "\n")
+
+    with pytest.raises(NotesBundleError):
+        load_bundle(bundle_path)
+
+
+def test_main(notes_file, tmp_path, capsys):
+    output = tmp_path / "out.sgnotes"
+
+    assert main([str(notes_file), "-o", str(output)]) == 0
+    assert output.exists()
+    assert main([str(tmp_path / "missing.md")]) == 1
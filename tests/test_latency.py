@@ -0,0 +1,67 @@
+from unittest.mock import patch
+
+import pytest
+
+from splitguides.latency import LatencyStats, LatencyTracker, percentile
+
+
+@pytest.mark.parametrize(
+    "pct, expected",
+    [(0, 1.0), (50, 5.0), (90, 9.0), (99, 10.0), (100, 10.0)]
+)
+def test_percentile(pct, expected):
+    samples = [float(i) for i in range(1, 11)]
+    assert percentile(samples, pct) == expected
+
+
+def test_percentile_empty():
+    assert percentile([], 50) == 0.0
+
+
+def test_summary():
+    stats = LatencyStats()
+    for ms in range(1, 101):
+        stats.add("display", ms / 1000)
+
+    summary = stats.summary()["display"]
+    assert summary["count"] == 100
+    assert summary["p50_ms"] == pytest.approx(50)
+    assert summary["p99_ms"] == pytest.approx(99)
+    assert summary["max_ms"] == pytest.approx(100)
+
+    assert stats.format_summary().startswith("display: n=100 p50=50.0ms")
+
+
+def test_tracker():
+    stats = LatencyStats()
+    tracker = LatencyTracker(stats)
+
+    with patch("splitguides.latency.time.perf_counter") as fake_time:
+        # Nothing observed yet
+        tracker.mark("render")
+        assert stats.summary() == {}
+
+        tracker.observe(10.0)
+        fake_time.return_value = 10.1
+        tracker.mark("render")
+        fake_time.return_value = 10.25
+        tracker.mark("display", finish=True)
+
+        # Finished, later marks are ignored until the next observation
+        tracker.mark("display", finish=True)
+
+    summary = stats.summary()
+    assert summary["render"]["count"] == 1
+    assert summary["render"]["max_ms"] == pytest.approx(100)
+    assert summary["display"]["count"] == 1
+    assert summary["display"]["max_ms"] == pytest.approx(250)
+
+
+def test_tracker_disabled():
+    stats = LatencyStats()
+    tracker = LatencyTracker(stats, enabled=False)
+
+    tracker.observe(0.0)
+    tracker.mark("display", finish=True)
+
+    assert stats.summary() == {}
@@ -1,4 +1,6 @@
-from splitguides.livesplit_client import get_client
+import pytest
+
+from splitguides.livesplit_client import get_client, parse_endpoint
 
 
 def test_get_client():
@@ -6,3 +8,21 @@ def test_get_client():
     assert client.connection.server == "servername"
     assert client.connection.port == 12
     assert client.connection.timeout == 2
+
+
+@pytest.mark.parametrize(
+    "endpoint, expected",
+    [
+        ("localhost", ("localhost", 16834)),
+        ("runner2:16835", ("runner2", 16835)),
+        (" 192.168.0.2:9000 ", ("192.168.0.2", 9000)),
+    ]
+)
+def test_parse_endpoint(endpoint, expected):
+    assert parse_endpoint(endpoint) == expected
+
+
+@pytest.mark.parametrize("endpoint", [":16834", "localhost:port", ""])
+def test_parse_endpoint_invalid(endpoint):
+    with pytest.raises(ValueError):
+        parse_endpoint(endpoint)
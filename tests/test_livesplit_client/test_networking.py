@@ -1,9 +1,9 @@
 import socket
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, call
 
 import pytest
 
-from splitguides.livesplit_client import LivesplitConnection, BUFFER_SIZE
+from splitguides.livesplit_client import LivesplitConnection, ConnectionState, BUFFER_SIZE
 
 
 def test_init():
@@ -161,3 +161,102 @@ def test_receive_oserror():
 
         mock_sock.close.assert_called_once()
         assert connection.sock is None
+
+
+def test_connect_options():
+    with patch("socket.socket") as mock_socket:
+        mock_sock = MagicMock()
+        mock_socket.return_value = mock_sock
+
+        connection = LivesplitConnection(server="host", port=12, timeout=2, connect_timeout=0.25)
+        connection.connect()
+
+        mock_sock.setsockopt.assert_any_call(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        mock_sock.setsockopt.assert_any_call(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+        # Connect timeout is used for the connection, then the regular timeout
+        assert mock_sock.settimeout.call_args_list == [call(0.25), call(2)]
+
+
+def test_connect_timeout():
+    with patch("socket.socket") as mock_socket:
+        mock_sock = MagicMock()
+        mock_socket.return_value = mock_sock
+
+        mock_sock.connect.side_effect = socket.timeout("Should be handled")
+        connection = LivesplitConnection()
+
+        assert connection.connect() is False
+        mock_sock.close.assert_called_once()
+        assert connection.sock is None
+
+
+def test_cached_address():
+    with patch("socket.socket") as mock_socket:
+        mock_sock = MagicMock()
+        mock_socket.return_value = mock_sock
+        mock_sock.getpeername.return_value = ("192.168.0.2", 16834)
+
+        connection = LivesplitConnection(server="host")
+        connection.connect()
+        connection.close()
+        connection.connect()
+
+        assert mock_sock.connect.call_args_list == [
+            call(("host", 16834)),
+            call(("192.168.0.2", 16834)),
+        ]
+
+        # A failed connection clears the cache so the name is resolved again
+        mock_sock.connect.side_effect = ConnectionRefusedError()
+        connection.close()
+        connection.connect()
+        mock_sock.connect.side_effect = None
+        connection.connect()
+
+        mock_sock.connect.assert_called_with(("host", 16834))
+
+
+def test_resolve_failure_retry():
+    with patch("socket.socket") as mock_socket, \
+            patch("splitguides.livesplit_client.time.monotonic") as fake_time:
+        mock_sock = MagicMock()
+        mock_socket.return_value = mock_sock
+        mock_sock.connect.side_effect = socket.gaierror()
+
+        fake_time.return_value = 100.0
+        connection = LivesplitConnection(server="unknown", resolve_retry=5.0)
+
+        assert connection.connect() is False
+        assert connection.connect() is False
+        mock_sock.connect.assert_called_once()
+
+        fake_time.return_value = 106.0
+        assert connection.connect() is False
+        assert mock_sock.connect.call_count == 2
+
+
+def test_connection_state():
+    with patch("socket.socket") as mock_socket:
+        mock_sock = MagicMock()
+        mock_socket.return_value = mock_sock
+
+        states = []
+        connection = LivesplitConnection()
+        connection.add_state_callback(states.append)
+
+        assert connection.state is ConnectionState.DISCONNECTED
+
+        connection.connect()
+        assert connection.state is ConnectionState.CONNECTED
+
+        mock_sock.recv.return_value = b""
+        with pytest.raises(ConnectionError):
+            connection.receive()
+
+        assert connection.state is ConnectionState.DISCONNECTED
+        assert states == [
+            ConnectionState.CONNECTING,
+            ConnectionState.CONNECTED,
+            ConnectionState.DISCONNECTED,
+        ]
@@ -0,0 +1,150 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from splitguides.livesplit_client import (
+    SplitWatcher,
+    SplitEventType,
+    TimerPhase,
+)
+
+
+def make_watcher(index, phase, debounce=0.0):
+    fake_client = MagicMock()
+    fake_client.connect.return_value = True
+    fake_client.get_split_index.return_value = index
+    fake_client.get_current_timer_phase.return_value = phase
+    fake_client.receive.return_value = "1:10:46.91"
+
+    watcher = SplitWatcher(fake_client, debounce=debounce)
+    return fake_client, watcher
+
+
+def kinds(events):
+    return [event.kind for event in events]
+
+
+def test_connect_event():
+    fake_client, watcher = make_watcher(2, "Running")
+
+    events = watcher.poll()
+
+    assert kinds(events) == [SplitEventType.CONNECTED]
+    assert events[0].index == 2
+    assert events[0].phase == TimerPhase.RUNNING
+
+    # No change, no events
+    assert watcher.poll() == []
+
+
+def test_failed_connect():
+    fake_client, watcher = make_watcher(0, "Running")
+    fake_client.connect.return_value = False
+
+    assert watcher.poll() == []
+    assert watcher.connected is False
+
+
+def test_disconnect_event():
+    fake_client, watcher = make_watcher(3, "Running")
+    watcher.poll()
+
+    fake_client.get_split_index.side_effect = ConnectionError()
+    events = watcher.poll()
+
+    assert kinds(events) == [SplitEventType.DISCONNECTED]
+    assert events[0].index == 3
+    assert watcher.connected is False
+    fake_client.close.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "start, end, expected",
+    [
+        ((-1, "NotRunning"), (0, "Running"), [SplitEventType.STARTED]),
+        ((0, "Running"), (1, "Running"), [SplitEventType.SPLIT_ADVANCED]),
+        ((2, "Running"), (1, "Running"), [SplitEventType.UNDO]),
+        ((2, "Running"), (-1, "NotRunning"), [SplitEventType.RESET]),
+        ((2, "Running"), (2, "Paused"), [SplitEventType.PAUSED]),
+        ((2, "Paused"), (2, "Running"), [SplitEventType.RESUMED]),
+        (
+            (4, "Running"),
+            (5, "Ended"),
+            [SplitEventType.SPLIT_ADVANCED, SplitEventType.FINISHED]
+        ),
+        ((5, "Ended"), (4, "Running"), [SplitEventType.UNDO]),
+    ]
+)
+def test_events(start, end, expected):
+    fake_client, watcher = make_watcher(*start)
+    watcher.poll()
+
+    fake_client.get_split_index.return_value = end[0]
+    fake_client.get_current_timer_phase.return_value = end[1]
+
+    events = watcher.poll()
+    assert kinds(events) == expected
+    assert all(event.index == end[0] for event in events)
+
+
+def test_skip_event():
+    fake_client, watcher = make_watcher(1, "Running")
+    watcher.poll()
+
+    fake_client.get_split_index.return_value = 2
+    fake_client.receive.return_value = "-"
+
+    events = watcher.poll()
+    assert kinds(events) == [SplitEventType.SKIP]
+    fake_client.send.assert_called_with("getlastsplittime")
+
+
+def test_debounce():
+    with patch("splitguides.livesplit_client.time.monotonic") as fake_time:
+        fake_time.return_value = 10.0
+        fake_client, watcher = make_watcher(1, "Running", debounce=0.2)
+        watcher.poll()
+
+        fake_client.get_split_index.return_value = 2
+        assert watcher.poll() == []
+
+        # Bounced back before the debounce time
+        fake_time.return_value = 10.1
+        fake_client.get_split_index.return_value = 1
+        assert watcher.poll() == []
+
+        fake_client.get_split_index.return_value = 2
+        fake_time.return_value = 10.2
+        assert watcher.poll() == []
+
+        fake_time.return_value = 10.5
+        assert kinds(watcher.poll()) == [SplitEventType.SPLIT_ADVANCED]
+
+
+def test_track_names():
+    fake_client, watcher = make_watcher(0, "Running")
+    watcher.track_names = True
+    fake_client.get_current_split_name.return_value = "Asylum Demon"
+
+    events = watcher.poll()
+    assert events[0].name == "Asylum Demon"
+
+    fake_client.get_split_index.return_value = 1
+    fake_client.get_current_split_name.return_value = "Taurus Demon"
+
+    events = watcher.poll()
+    assert events[0].name == "Taurus Demon"
+    assert fake_client.get_current_split_name.call_count == 2
+
+    # The name is only requested when the index changes
+    watcher.poll()
+    assert fake_client.get_current_split_name.call_count == 2
+
+
+def test_observed_time():
+    with patch("splitguides.livesplit_client.time.perf_counter") as fake_time:
+        fake_time.return_value = 12.5
+        fake_client, watcher = make_watcher(0, "Running")
+
+        events = watcher.poll()
+        assert events[0].observed == 12.5
@@ -1,10 +1,11 @@
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 from pathlib import Path
 
 from unittest.mock import patch, mock_open
 
-from splitguides.note_parser import Notes, TextProcessor
+from splitguides.note_parser import Notes, TextProcessor, get_cleaner
 
 notes_base = [
     "This is the first split",
@@ -74,6 +75,33 @@ def test_render_safe(safe_mode, expected):
     assert result[0] == expected
 
 
+def test_cleaner_shared():
+    # Notes with the same configuration share a cleaner
+    first = Notes(StringIO("First notes"))
+    second = Notes(StringIO("Second notes"))
+    assert first.cleaner is second.cleaner
+
+    # The cache key doesn't depend on the order or type of the configuration
+    assert get_cleaner({"p", "div"}, {"img": ["src"]}, set()) is get_cleaner(
+        ["div", "p"], {"img": ("src",)}, ()
+    )
+    assert get_cleaner({"p"}, {}, set()) is not get_cleaner({"div"}, {}, set())
+
+
+def test_cleaner_per_thread():
+    cleaner = get_cleaner({"p"}, {}, set())
+
+    main_cleaner = cleaner.get_thread_cleaner()
+    assert cleaner.get_thread_cleaner() is main_cleaner
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        thread_cleaner = pool.submit(cleaner.get_thread_cleaner).result()
+        result = pool.submit(cleaner.clean, "<p>text</p><script>bad</script>").result()
+
+    assert thread_cleaner is not main_cleaner
+    assert result == "<p>text</p>&lt;script&gt;bad&lt;/script&gt;"
+
+
 def test_ignore_blank():
     notes_modified = notes_base.copy()
     notes_modified.insert(4, "")  # insert an extra blank so there's a double
@@ -97,3 +125,70 @@ def test_from_file():
     assert isinstance(notes.preprocessor, TextProcessor)
 
     assert_notes_match(notes)
+
+
+notes_named = [
+    "[split: Asylum Demon]",
+    "First split",
+    "",
+    "[Split: -Taurus Demon]",
+    "Second split",
+    "",
+    "[split: {Parish}Bell Gargoyles]",
+    "Third split",
+    "",
+    "[split: Taurus Demon]",
+    "Repeated name",
+]
+
+
+def test_split_names():
+    notes = Notes(StringIO("\n".join(notes_named)))
+
+    assert len(notes.notes) == 4
+    assert notes.split_names == {
+        "asylum demon": [0],
+        "taurus demon": [1, 3],
+        "bell gargoyles": [2],
+    }
+
+
+@pytest.mark.parametrize(
+    "index, name, expected",
+    [
+        (5, "Asylum Demon", 0),
+        (0, "{Parish}Bell Gargoyles", 2),
+        (0, "-Taurus Demon", 1),
+        (3, "Taurus Demon", 3),
+        (2, "Not in notes", 2),
+        (2, None, 2),
+    ]
+)
+def test_lookup_index(index, name, expected):
+    notes = Notes(StringIO("\n".join(notes_named)))
+    assert notes.lookup_index(index, name) == expected
+
+
+def test_split_index():
+    notes = Notes(StringIO(notes_blank_delimiter))
+    index = notes.index
+
+    assert len(index) == 3
+    assert list(index.starts) == [0, 5, 9]
+    assert list(index.ends) == [4, 8, 10]
+    assert list(index.line_counts) == [2, 2, 1]
+
+    assert index.clamp(-2, 10) == (0, 3)
+    assert index.split_for_line(3) == 0
+    assert index.split_for_line(4) == -1  # Separator
+    assert index.split_for_line(6) == 1
+    assert index.split_for_line(20) == -1
+
+
+def test_split_index_changes():
+    notes = Notes(StringIO(notes_blank_delimiter))
+    edited = Notes(StringIO(notes_blank_delimiter.replace("Third", "3rd") + "\n\nFourth"))
+
+    assert notes.index.changed_splits(notes.index) == set()
+    assert notes.index.changed_splits(edited.index) == {2, 3}
+    assert edited.index.hashes[0] == notes.index.hashes[0]
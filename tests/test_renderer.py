@@ -0,0 +1,61 @@
+from jinja2 import Environment, FileSystemLoader, Template
+
+from splitguides import tracing
+from splitguides.renderer import PageShell
+from splitguides.settings import DEFAULT_TEMPLATE_FOLDER
+
+
+def get_desktop_template():
+    environment = Environment(
+        loader=FileSystemLoader(DEFAULT_TEMPLATE_FOLDER),
+        autoescape=False,
+    )
+    return environment.get_template(
+        "desktop.html",
+        globals={
+            "font_size": 20.0,
+            "font_color": "#000000ff",
+            "bg_color": "transparent",
+            "css": ".main-content { margin: 0; }",
+        },
+    )
+
+
+def test_splice_matches_template():
+    template = get_desktop_template()
+    shell = PageShell(template)
+
+    assert shell.can_splice
+
+    for notes in (["<p>One</p>"], ["<p>One</p>", "<p>Two</p>", "<p>Three</p>"]):
+        assert shell.render(notes) == template.render(notes=notes)
+
+
+def test_render_sizes():
+    shell = PageShell(get_desktop_template())
+
+    tracing.clear()
+    tracing.enable()
+    try:
+        html = shell.render(["<p>One</p>", "<p>Two</p>"])
+        counters = tracing.get_counters()
+    finally:
+        tracing.disable()
+        tracing.clear()
+
+    assert len(counters) == 1
+    name, category, _, values, _ = counters[0]
+    assert (name, category) == ("page.size", "render")
+    assert values["page"] == len(html)
+    assert values["page"] == shell.shell_size + values["notes"]
+
+
+def test_fallback_render():
+    # Output depends on the loop index so can't be spliced
+    template = Template(
+        "{% for note in notes %}<div id='{{ loop.index }}'>{{ note }}</div>{% endfor %}"
+    )
+    shell = PageShell(template)
+
+    assert not shell.can_splice
+    assert shell.render(["a", "b"]) == "<div id='1'>a</div><div id='2'>b</div>"
@@ -0,0 +1,71 @@
+from io import StringIO
+
+from splitguides.note_parser import Notes
+from splitguides.search import SearchIndex, preview, tokenise
+
+notes_text = """\
+Grab the **Crest Key** from the [chest](images/chest.png)
+
+<span class="boss">Taurus Demon</span>
+Plunge attack
+
+Buy the master key
+[comment about the key]
+
+Kill the Taurus Demon again
+"""
+
+
+def test_tokenise():
+    assert tokenise("Grab the **Crest Key** [chest](images/chest.png)") == [
+        "grab", "the", "crest", "key", "chest"
+    ]
+    assert tokenise('<span class="boss">Taurus</span>') == ["taurus"]
+
+
+def test_search():
+    notes = Notes(StringIO(notes_text))
+
+    assert notes.search("key") == [0, 2]
+    assert notes.search("taurus demon") == [1, 3]
+    assert notes.search("TAURUS plun") == [1]
+    assert notes.search("images") == []
+    assert notes.search("comment") == []
+    assert notes.search("  ") == []
+
+
+def test_incremental_rebuild():
+    notes = Notes(StringIO(notes_text))
+    index = SearchIndex.from_notes(notes)
+
+    edited_text = "Warp to the shrine\n\n" + notes_text.replace("master", "residence")
+    edited = Notes(StringIO(edited_text))
+    rebuilt = SearchIndex.from_notes(edited, index)
+
+    # Unchanged splits keep their tokens
+    old_tokens = index.tokens_by_hash[notes.index.hashes[0]]
+    assert rebuilt.tokens_by_hash[edited.index.hashes[1]] is old_tokens
+    assert rebuilt.postings == SearchIndex.from_notes(edited).postings
+    assert rebuilt.search("key") == [1, 3]
+    assert rebuilt.search("master") == []
+
+    # The old index is unchanged
+    assert index.search("master") == [2]
+    assert index.search("shrine") == []
+
+
+def test_images_and_links():
+    text = "Warp\n\n![icon](images/icon.png) Open the [gate](https://example.com/gate)\n"
+    notes = Notes(StringIO(text))
+
+    assert tokenise("![icon](a.png) Open the [gate](gate.html)") == ["open", "the", "gate"]
+    assert notes.search("gate") == [1]
+    assert notes.search("icon") == []
+    assert notes.search("example") == []
+    assert preview("![icon](a.png) Second") == "Second"
+    assert preview("[Link](a.html) Second") == "Link Second"
+
+
+def test_preview():
+    assert preview('\n<span class="boss">Taurus Demon</span>\nPlunge') == "Taurus Demon"
+    assert preview("a" * 100, length=10) == "aaaaaaa..."
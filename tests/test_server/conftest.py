@@ -0,0 +1,27 @@
+import pytest
+
+from splitguides.server import split_server
+
+
+@pytest.fixture(scope="function")
+def server_notes(tmp_path, monkeypatch):
+    """
+    Serve two notes files from a temporary folder
+    """
+    monkeypatch.setattr(split_server, "documents", {})
+    monkeypatch.setattr(split_server, "root_document", None)
+    monkeypatch.setattr(split_server, "notes", None)
+    monkeypatch.setattr(split_server, "notefile", None)
+    monkeypatch.setattr(split_server.settings, "previous_splits", 0)
+    monkeypatch.setattr(split_server.settings, "next_splits", 0)
+
+    first = tmp_path / "first" / "route.txt"
+    second = tmp_path / "second" / "route.txt"
+    first.parent.mkdir()
+    second.parent.mkdir()
+    first.write_text("First split\n\nSecond split\n")
+    second.write_text("Other notes\n")
+    (first.parent / "image.txt").write_text("first image")
+    (second.parent / "image.txt").write_text("second image")
+
+    yield split_server.add_notes(first), split_server.add_notes(second)
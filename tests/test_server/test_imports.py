@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+import splitguides
+
+# Run in a fresh interpreter as the test session itself may already have Qt loaded
+IMPORT_CHECK = """
+import sys
+import splitguides.server.__main__
+
+heavy = sorted(
+    name for name in sys.modules
+    if name.split(".")[0] in {"PySide6", "shiboken6", "keyboard"}
+)
+print(",".join(heavy))
+"""
+
+
+def test_server_does_not_import_qt():
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(
+            [os.path.dirname(os.path.dirname(splitguides.__file__)), *sys.path]
+        ),
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_CHECK],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+
+    assert result.stdout.strip() == ""
@@ -0,0 +1,130 @@
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from splitguides.server import __main__ as server_main, split_server
+
+
+@pytest.fixture(scope="function")
+def fake_serve():
+    with patch.object(server_main, "serve") as fake_serve:
+        yield fake_serve
+
+
+def test_headless_launch(server_notes, fake_serve, monkeypatch):
+    first, second = server_notes
+    monkeypatch.setattr(split_server, "documents", {})
+    monkeypatch.setattr(split_server, "root_document", None)
+    monkeypatch.setattr(split_server.settings, "hostname", "localhost")
+    monkeypatch.setattr(split_server.settings, "port", 16834)
+    monkeypatch.setattr(split_server.settings, "server_hostname", "localhost")
+    monkeypatch.setattr(split_server.settings, "server_port", 8000)
+
+    with patch.object(server_main, "launch_qt") as fake_launch_qt:
+        server_main.launch([
+            "--notes", str(first.path),
+            "--notes", str(second.path),
+            "--notes", str(first.path),
+            "--host", "0.0.0.0",
+            "--port", "8080",
+            "--livesplit", "runner1:16835",
+            "--livesplit", "runner2",
+        ])
+
+    fake_launch_qt.assert_not_called()
+    fake_serve.assert_called_once()
+
+    assert split_server.settings.server_hostname == "0.0.0.0"
+    assert split_server.settings.server_port == 8080
+
+    livesplit = {name: doc.livesplit for name, doc in split_server.documents.items()}
+    assert livesplit == {
+        "route": ("runner1", 16835),
+        "route-2": ("runner2", 16834),
+        "route-3": ("runner1", 16835),
+    }
+
+
+def test_headless_missing_notes(tmp_path, fake_serve):
+    server_main.launch(["--notes", str(tmp_path / "missing.txt")])
+    fake_serve.assert_not_called()
+
+
+def test_qt_launch_default(fake_serve):
+    with patch.object(server_main, "launch_qt") as fake_launch_qt:
+        server_main.launch([])
+
+    fake_launch_qt.assert_called_once()
+
+
+def test_headless_repeated_livesplit(server_notes, fake_serve, monkeypatch):
+    first, second = server_notes
+    monkeypatch.setattr(split_server, "documents", {})
+    monkeypatch.setattr(split_server, "root_document", None)
+    monkeypatch.setattr(split_server.settings, "hostname", "localhost")
+    monkeypatch.setattr(split_server.settings, "port", 16834)
+
+    # Two notes files following the same runner
+    server_main.launch([
+        "--notes", str(first.path),
+        "--notes", str(second.path),
+        "--notes", str(first.path),
+        "--livesplit", "runner1",
+        "--livesplit", "runner1",
+        "--livesplit", "runner2",
+    ])
+
+    fake_serve.assert_called_once()
+    livesplit = {name: doc.livesplit for name, doc in split_server.documents.items()}
+    assert livesplit == {
+        "route": ("runner1", 16834),
+        "route-2": ("runner1", 16834),
+        "route-3": ("runner2", 16834),
+    }
+
+
+def test_headless_invalid_livesplit(server_notes, fake_serve, capsys):
+    first, _ = server_notes
+
+    server_main.launch(["--notes", str(first.path), "--livesplit", "runner1:port"])
+
+    fake_serve.assert_not_called()
+    assert "Invalid port in livesplit server 'runner1:port'" in capsys.readouterr().out
+
+
+def test_qt_launch_overrides_not_saved(fake_serve, monkeypatch):
+    monkeypatch.setattr(split_server.settings, "server_hostname", "localhost")
+    monkeypatch.setattr(split_server.settings, "server_port", 8000)
+
+    saved = []
+
+    def get_notes(parent, settings):
+        saved.append((settings.server_hostname, settings.server_port))
+        return True
+
+    # Avoid importing the Qt dialogs, only their order matters here
+    fake_settings_ui = MagicMock()
+    fake_settings_ui.ServerSettingsDialog.return_value.exec.return_value = 1
+    fake_settings_ui.get_notes = get_notes
+
+    with patch("PySide6.QtWidgets.QApplication"), \
+            patch("PySide6.QtWidgets.QMainWindow"), \
+            patch.dict(sys.modules, {"splitguides.ui.server_settings_ui": fake_settings_ui}):
+        server_main.launch(["--host", "0.0.0.0", "--port", "8080"])
+
+    # The settings are saved by get_notes before the command line values are used
+    assert saved == [("localhost", 8000)]
+    assert split_server.settings.server_hostname == "0.0.0.0"
+    assert split_server.settings.server_port == 8080
+    fake_serve.assert_called_once()
+
+
+def test_qt_launch_livesplit_rejected(fake_serve, capsys):
+    with patch.object(server_main, "launch_qt") as fake_launch_qt:
+        with pytest.raises(SystemExit):
+            server_main.launch(["--livesplit", "runner1:16835"])
+
+    fake_launch_qt.assert_not_called()
+    fake_serve.assert_not_called()
+    assert "--livesplit requires --notes" in capsys.readouterr().err
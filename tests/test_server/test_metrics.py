@@ -0,0 +1,59 @@
+import pytest
+
+from splitguides.server.metrics import MetricsRegistry
+
+
+def test_counter_gauge():
+    registry = MetricsRegistry()
+    counter = registry.counter("test_total", "Test counter")
+    gauge = registry.gauge("test_gauge", "Test gauge")
+
+    counter.inc()
+    counter.inc(2)
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+
+    assert registry.as_dict() == {"test_total": 3, "test_gauge": 1}
+
+
+def test_histogram():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_seconds", "Test histogram", buckets=(0.1, 1.0))
+
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5.0)
+
+    assert histogram.bucket_counts == [1, 1, 1]
+    assert registry.as_dict()["test_seconds"] == {
+        "count": 3, "sum": 5.55, "mean": 5.55 / 3
+    }
+
+
+def test_exposition():
+    registry = MetricsRegistry()
+    registry.counter("test_total", "Test counter").inc()
+    histogram = registry.histogram("test_seconds", "Test histogram", buckets=(0.1, 1.0))
+    histogram.observe(0.5)
+
+    assert registry.exposition() == (
+        "# HELP test_total Test counter\n"
+        "# TYPE test_total counter\n"
+        "test_total 1\n"
+        "# HELP test_seconds Test histogram\n"
+        "# TYPE test_seconds histogram\n"
+        'test_seconds_bucket{le="0.1"} 0\n'
+        'test_seconds_bucket{le="1.0"} 1\n'
+        'test_seconds_bucket{le="+Inf"} 1\n'
+        "test_seconds_sum 0.5\n"
+        "test_seconds_count 1\n"
+    )
+
+
+def test_duplicate_name():
+    registry = MetricsRegistry()
+    registry.counter("test_total", "Test counter")
+
+    with pytest.raises(ValueError):
+        registry.counter("test_total", "Test counter")
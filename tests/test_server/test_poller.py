@@ -0,0 +1,166 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from splitguides.livesplit_client import SplitEvent, SplitEventType
+from splitguides.server.poller import LivesplitPoller, PollerState
+
+
+def test_update():
+    poller = LivesplitPoller("localhost", 16834)
+    assert poller.state == PollerState()
+
+    poller.update(connected=True, index=2)
+    assert poller.state == PollerState(version=1, connected=True, index=2)
+
+    poller.update(index=3)
+    assert poller.state == PollerState(version=2, connected=True, index=3)
+
+
+def test_wait_for_change():
+    poller = LivesplitPoller("localhost", 16834)
+
+    # No version given and livesplit not polled yet - wait until the timeout
+    assert poller.wait_for_change(None, timeout=0.01).version == 0
+
+    # Timeout with no change
+    assert poller.wait_for_change(0, timeout=0.01).version == 0
+
+    timer = threading.Timer(0.01, poller.update, kwargs={"index": 1})
+    timer.start()
+    state = poller.wait_for_change(0, timeout=10)
+    timer.join()
+
+    assert state.version == 1
+    assert state.index == 1
+
+
+def test_handle_events():
+    connects, disconnects = MagicMock(), MagicMock()
+    poller = LivesplitPoller(
+        "localhost", 16834, connects=connects, disconnects=disconnects
+    )
+
+    poller.handle_events([SplitEvent(SplitEventType.CONNECTED, 1, name="Split")])
+    assert poller.state.connected is True
+    assert poller.state.index == 1
+    assert poller.state.name == "Split"
+    connects.inc.assert_called_once()
+
+    poller.handle_events([SplitEvent(SplitEventType.DISCONNECTED, 1)])
+    assert poller.state.connected is False
+    disconnects.inc.assert_called_once()
+
+
+def test_run_stops_without_subscribers():
+    with patch("splitguides.server.poller.get_client") as fake_get_client:
+        fake_client = MagicMock()
+        fake_client.connect.return_value = False
+        fake_get_client.return_value = fake_client
+
+        poller = LivesplitPoller("localhost", 16834, interval=0.001)
+        poller.subscribe()
+        thread = poller.thread
+        assert thread.is_alive()
+
+        poller.unsubscribe()
+        thread.join(timeout=5)
+
+        assert not thread.is_alive()
+        assert poller.thread is None
+        fake_client.close.assert_called()
+
+
+def test_wait_for_other_change():
+    poller = LivesplitPoller("localhost", 16834)
+    poller.update(connected=True, index=1)
+    version = poller.state.version
+
+    changes = []
+
+    def notify_later():
+        time.sleep(0.05)
+        changes.append(True)
+        poller.notify()
+
+    thread = threading.Thread(target=notify_later)
+    thread.start()
+    state = poller.wait_for_change(version, timeout=5, changed=lambda: bool(changes))
+    thread.join()
+
+    assert changes
+    assert state.version == version
+
+
+
+def test_wait_for_first_poll():
+    with patch("splitguides.server.poller.SplitWatcher") as fake_watcher_cls:
+        polls = []
+
+        def poll():
+            polls.append(True)
+            if len(polls) == 1:
+                time.sleep(0.05)
+                return [SplitEvent(SplitEventType.CONNECTED, 2)]
+            return []
+
+        fake_watcher = fake_watcher_cls.return_value
+        fake_watcher.poll.side_effect = poll
+
+        poller = LivesplitPoller("localhost", 16834, interval=0.001)
+        # State left over from an earlier run of the poller
+        poller.update(connected=False, index=1)
+
+        poller.subscribe()
+        state = poller.wait_for_change(None, timeout=5)
+
+        # The state from livesplit is returned, not the old state
+        assert state.connected is True
+        assert state.index == 2
+
+        thread = poller.thread
+        poller.unsubscribe()
+        thread.join(timeout=5)
+        assert poller.polled is False
+
+
+def test_stop_before_new_thread_connects():
+    with patch("splitguides.server.poller.SplitWatcher") as fake_watcher_cls:
+        fake_watcher = fake_watcher_cls.return_value
+        fake_watcher.connected = True
+        fake_watcher.poll.return_value = []
+
+        closing = threading.Event()
+        restarted = threading.Event()
+
+        def close():
+            # A new subscriber arrives while the old thread is closing its client
+            if not closing.is_set():
+                closing.set()
+                restarted.wait(timeout=5)
+
+        fake_watcher.client.close.side_effect = close
+
+        poller = LivesplitPoller("localhost", 16834, interval=0.001)
+        poller.update(connected=True, index=1)
+        poller.subscribe()
+        old_thread = poller.thread
+        poller.unsubscribe()
+        assert closing.wait(timeout=5)
+
+        # The old thread marked livesplit as disconnected before it was replaced
+        assert poller.state.connected is False
+
+        poller.subscribe()
+        new_thread = poller.thread
+        assert new_thread is not old_thread
+        poller.update(connected=True, index=2)
+        restarted.set()
+        old_thread.join(timeout=5)
+
+        # The old thread finishing doesn't overwrite the new connection
+        assert poller.state.connected is True
+        assert poller.state.index == 2
+
+        poller.unsubscribe()
+        new_thread.join(timeout=5)
@@ -0,0 +1,344 @@
+import os
+import threading
+from unittest.mock import MagicMock, patch
+
+from splitguides.livesplit_client import SplitEvent, SplitEventType
+from splitguides.note_parser import Notes, TextProcessor
+from splitguides.server import app, split_server
+from splitguides.server.poller import LivesplitPoller, PollerState
+
+
+def test_metrics_page():
+    client = app.test_client()
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert "# TYPE splitguides_sse_clients gauge" in response.text
+    assert "splitguides_render_seconds_count" in response.text
+
+
+def test_status_page():
+    client = app.test_client()
+    response = client.get("/status")
+
+    assert response.status_code == 200
+    assert "splitguides_livesplit_poll_seconds" in response.json["metrics"]
+
+
+def test_add_notes(server_notes):
+    first, second = server_notes
+
+    assert first.name == "route"
+    assert second.name == "route-2"
+    assert split_server.documents == {"route": first, "route-2": second}
+
+    # The first notes are served at the root
+    assert split_server.root_document is first
+    assert split_server.notes is first.notes
+    assert split_server.notefile == first.path
+
+
+def test_livesplit_binding(server_notes, monkeypatch):
+    monkeypatch.setattr(split_server.settings, "hostname", "localhost")
+    monkeypatch.setattr(split_server.settings, "port", 16834)
+
+    first, second = server_notes
+    assert first.livesplit == ("localhost", 16834)
+
+    third = split_server.add_notes(first.path, livesplit="runner2:16835")
+    assert third.livesplit == ("runner2", 16835)
+
+    fourth = split_server.add_notes(first.path, livesplit="runner3")
+    assert fourth.livesplit == ("runner3", 16834)
+
+
+def test_shared_poller(monkeypatch):
+    monkeypatch.setattr(split_server, "pollers", {})
+
+    poller = split_server.get_poller("localhost", 16834)
+    assert split_server.get_poller("localhost", 16834) is poller
+    assert split_server.get_poller("runner2", 16834) is not poller
+
+
+def test_named_pages(server_notes):
+    client = app.test_client()
+
+    assert client.get("/").status_code == 200
+    assert "SplitGuides - route-2" in client.get("/n/route-2/").text
+    assert client.get("/n/missing/").status_code == 404
+
+
+def test_named_files(server_notes):
+    client = app.test_client()
+
+    assert client.get("/image.txt").text == "first image"
+    assert client.get("/n/route/image.txt").text == "first image"
+    assert client.get("/n/route-2/image.txt").text == "second image"
+
+
+def test_document_render(server_notes):
+    first, _ = server_notes
+
+    assert first.render(1) == "Second split<br>"
+    assert first.cache == {first.notes.index.hashes[1]: "Second split<br>"}
+
+
+def test_event_stream(server_notes):
+    first, _ = server_notes
+
+    fake_poller = MagicMock()
+    fake_poller.wait_for_change.side_effect = [
+        PollerState(version=1, connected=False),
+        PollerState(version=2, connected=True, index=1),
+        PollerState(version=2, connected=True, index=1),
+    ]
+
+    stream = split_server.event_stream(first, fake_poller)
+    run_id = split_server.run_id
+
+    assert next(stream) == "retry: 1000\n\n"
+    assert next(stream).startswith(
+        f"id: {run_id}-0--1-d\ndata: <h2>Trying to connect to livesplit.</h2>"
+    )
+    assert next(stream) == f"id: {run_id}-0-1\ndata: Second split<br>\n\n"
+    assert next(stream) == ":No update, keep connection\n\n"
+
+    fake_poller.subscribe.assert_called_once()
+    stream.close()
+    fake_poller.unsubscribe.assert_called_once()
+
+
+def test_reload_keeps_unchanged_renders(server_notes):
+    first, _ = server_notes
+    first.render(0)
+    first.render(1)
+
+    first.path.write_text("First split\n\nSecond split edited\n")
+    os.utime(first.path, ns=(first.mtime + 1_000_000, first.mtime + 1_000_000))
+
+    assert first.check_for_changes()
+    assert first.version == 1
+    assert list(first.cache.values()) == ["First split<br>"]
+    assert first.render(1) == "Second split edited<br>"
+
+    # No further changes, nothing to reload
+    assert not first.check_for_changes()
+    assert first.version == 1
+
+
+def test_reload_moved_splits(server_notes):
+    first, _ = server_notes
+    first.render(1)
+
+    def parse(lines):
+        return split_server.Notes(lines, preprocessor=TextProcessor())
+
+    # Inserting a split moves the others but their renders are kept
+    assert first.reload(parse(["New split", "", "First split", "", "Second split"]))
+    assert first.version == 1
+    assert list(first.cache.values()) == ["Second split<br>"]
+    assert first.render(2) == "Second split<br>"
+
+    # Comment lines don't change the splits
+    assert not first.reload(
+        parse(["New split", "[comment]", "", "First split", "", "Second split"])
+    )
+    assert first.version == 1
+
+
+def test_event_stream_notes_reload(server_notes):
+    first, _ = server_notes
+
+    state = PollerState(version=1, connected=True, index=1)
+    fake_poller = MagicMock()
+    fake_poller.wait_for_change.return_value = state
+
+    stream = split_server.event_stream(first, fake_poller)
+    next(stream)  # retry hint
+    assert next(stream).endswith("\ndata: Second split<br>\n\n")
+
+    first.path.write_text("First split\n\nSecond split edited\n")
+    first.mtime = None
+    assert first.check_for_changes()
+
+    # Same livesplit state but the notes were edited
+    assert next(stream).endswith("\ndata: Second split edited<br>\n\n")
+    assert next(stream) == ":No update, keep connection\n\n"
+    stream.close()
+
+
+def test_event_stream_skipped_updates(server_notes):
+    first, _ = server_notes
+
+    fake_poller = MagicMock()
+    fake_poller.wait_for_change.side_effect = [
+        PollerState(version=1, connected=True, index=0),
+        PollerState(version=4, connected=True, index=1),
+    ]
+
+    dropped = split_server.sse_dropped_updates.value
+    stream = split_server.event_stream(first, fake_poller)
+    next(stream)  # retry hint
+
+    assert next(stream).endswith("\ndata: First split<br>\n\n")
+    assert next(stream).endswith("\ndata: Second split<br>\n\n")
+    assert split_server.sse_dropped_updates.value == dropped + 2
+    stream.close()
+
+
+def test_event_stream_slow_client_evicted(server_notes, monkeypatch):
+    first, _ = server_notes
+    monkeypatch.setattr(split_server, "SEND_TIMEOUT", 0.05)
+
+    fake_poller = MagicMock()
+    fake_poller.wait_for_change.return_value = PollerState(
+        version=1, connected=True, index=0
+    )
+
+    closed = threading.Event()
+    evictions = split_server.sse_evictions.value
+    stream = split_server.event_stream(first, fake_poller, close=closed.set)
+    next(stream)  # retry hint
+
+    assert next(stream).endswith("\ndata: First split<br>\n\n")
+
+    # The client doesn't accept the event, the connection is closed
+    assert closed.wait(timeout=5)
+    assert split_server.sse_evictions.value == evictions + 1
+
+    stream.close()
+    fake_poller.unsubscribe.assert_called_once()
+
+
+def test_event_stream_resume(server_notes):
+    first, _ = server_notes
+
+    fake_poller = MagicMock()
+    fake_poller.wait_for_change.side_effect = [
+        PollerState(version=1, connected=True, index=1),
+        PollerState(version=2, connected=True, index=0),
+    ]
+
+    last_event_id = split_server.get_event_id(first, 1, connected=True)
+    stream = split_server.event_stream(first, fake_poller, last_event_id)
+    next(stream)  # retry hint
+
+    # The client already has the notes for this split
+    assert next(stream) == ":No update, keep connection\n\n"
+    assert next(stream).endswith("\ndata: First split<br>\n\n")
+    stream.close()
+
+
+def test_event_stream_resume_poller_restart(server_notes):
+    first, _ = server_notes
+
+    with patch("splitguides.server.poller.SplitWatcher") as fake_watcher_cls:
+        fake_watcher = fake_watcher_cls.return_value
+        fake_watcher.poll.side_effect = [
+            [SplitEvent(SplitEventType.CONNECTED, 1)]
+        ] + [[]] * 10_000
+
+        poller = LivesplitPoller("localhost", 16834, interval=0.001)
+        # The previous stream closed and the poller stopped while disconnected
+        poller.update(connected=True, index=1)
+        poller.update(connected=False)
+
+        last_event_id = split_server.get_event_id(first, 1, connected=True)
+        stream = split_server.event_stream(first, poller, last_event_id)
+        next(stream)  # retry hint
+
+        # Once the restarted poller has connected the client already has the notes
+        assert next(stream) == ":No update, keep connection\n\n"
+
+        thread = poller.thread
+        stream.close()
+        thread.join(timeout=5)
+
+
+def test_splits_last_event_id(server_notes, monkeypatch):
+    fake_stream = MagicMock(return_value=iter(["retry: 1000\n\n"]))
+    monkeypatch.setattr(split_server, "event_stream", fake_stream)
+    monkeypatch.setattr(split_server, "start_notes_watcher", MagicMock())
+
+    client = app.test_client()
+    response = client.get("/splits", headers={"Last-Event-ID": "abc-0-1"})
+
+    assert response.mimetype == "text/event-stream"
+    assert fake_stream.call_args.args[2] == "abc-0-1"
+
+
+def test_document_render_windows(server_notes):
+    first, _ = server_notes
+
+    assert first.render(0, 0, 1) == "First split<br>Second split<br>"
+    assert first.render(1, 1, 0) == "First split<br>Second split<br>"
+    assert first.render(5) == "<h1>End of Splits</h1>"
+
+    # Each split is only rendered once whatever the window
+    hashes = first.notes.index.hashes
+    assert first.cache == {
+        hashes[0]: "First split<br>",
+        hashes[1]: "Second split<br>",
+        split_server.END_OF_SPLITS: "<h1>End of Splits</h1>",
+    }
+
+
+def test_document_render_assets(server_notes):
+    first, _ = server_notes
+    folder = first.path.parent
+    (folder / "chest.png").write_bytes(b"png data")
+    first.path.write_text(
+        '<img src="chest.png">\n\nSecond split\n\n<video src="skip.mp4"></video>\n'
+    )
+    first.reload(Notes.from_file(first.path))
+
+    # Small images are inlined and media in the next splits is preloaded
+    assert first.render(0) == (
+        '<img src="data:image/png;base64,cG5nIGRhdGE="><br>'
+        '<link rel="prefetch" href="skip.mp4">'
+    )
+    # The preloaded splits are rendered ahead of being shown
+    assert len(first.cache) == 3
+
+    # Editing an image sends the notes again with the new image
+    version = first.version
+    (folder / "chest.png").write_bytes(b"new data")
+    mtime = first.assets.get_mtime(folder / "chest.png") + 1_000_000
+    os.utime(folder / "chest.png", ns=(mtime, mtime))
+
+    assert first.check_for_changes()
+    assert first.version == version + 1
+    assert first.render(0).startswith('<img src="data:image/png;base64,bmV3IGRhdGE="><br>')
+
+
+def test_splits_window(server_notes, monkeypatch):
+    fake_stream = MagicMock(return_value=iter(["retry: 1000\n\n"]))
+    monkeypatch.setattr(split_server, "event_stream", fake_stream)
+    monkeypatch.setattr(split_server, "start_notes_watcher", MagicMock())
+
+    client = app.test_client()
+    client.get("/splits?previous=2&next=100")
+    assert fake_stream.call_args.args[3] == (2, split_server.MAX_WINDOW)
+
+    client.get("/splits?previous=one")
+    assert fake_stream.call_args.args[3] == (0, 0)
+
+
+def test_search(server_notes):
+    client = app.test_client()
+
+    response = client.get("/search?q=second")
+    assert response.json["results"] == [{"index": 1, "preview": "Second split"}]
+
+    response = client.get("/n/route-2/search?q=other")
+    assert response.json["results"] == [{"index": 0, "preview": "Other notes"}]
+
+
+def test_search_after_reload(server_notes):
+    first, _ = server_notes
+    assert first.search("edited") == []
+
+    lines = ["First split", "", "Second split edited"]
+    first.reload(split_server.Notes(lines, preprocessor=TextProcessor()))
+    assert first.search("edited") == [{"index": 1, "preview": "Second split edited"}]
@@ -0,0 +1,89 @@
+import socket
+import threading
+import time
+
+import waitress
+
+from splitguides.note_parser import Notes
+from splitguides.server import app, split_server
+from splitguides.server.poller import LivesplitPoller
+from splitguides.server.watchdog import SendWatchdog, get_connection_closer
+
+
+def wait_until(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_deadline_passed():
+    watchdog = SendWatchdog()
+    timed_out = threading.Event()
+
+    with watchdog.deadline(0.01, timed_out.set):
+        assert timed_out.wait(timeout=5)
+
+    assert watchdog.deadlines == {}
+
+
+def test_deadline_met():
+    watchdog = SendWatchdog()
+    timed_out = threading.Event()
+
+    with watchdog.deadline(0.05, timed_out.set):
+        pass
+
+    assert watchdog.deadlines == {}
+    assert not timed_out.wait(timeout=0.1)
+
+
+def test_connection_closer_other_server():
+    assert get_connection_closer({}) is None
+
+
+def test_stalled_client_evicted(server_notes, monkeypatch):
+    first, _ = server_notes
+    # Large splits so a few events fill the socket buffers
+    first.path.write_text(f"{'x' * 200_000}\n\n{'y' * 200_000}\n")
+    first.reload(Notes.from_file(first.path))
+
+    monkeypatch.setattr(split_server, "SEND_TIMEOUT", 0.2)
+    poller = LivesplitPoller(*first.livesplit)
+    # Don't start a polling thread, the test sets the state directly
+    monkeypatch.setattr(poller, "subscribe", lambda: None)
+    monkeypatch.setattr(poller, "unsubscribe", lambda: None)
+    poller.polled = True
+    monkeypatch.setattr(split_server, "pollers", {first.livesplit: poller})
+    monkeypatch.setattr(split_server, "start_notes_watcher", lambda: None)
+
+    server = waitress.create_server(
+        app, host="127.0.0.1", port=0, outbuf_high_watermark=16 * 1024
+    )
+    server_thread = threading.Thread(target=server.run, daemon=True)
+    server_thread.start()
+
+    clients = split_server.sse_clients.value
+    evictions = split_server.sse_evictions.value
+    try:
+        with socket.socket() as client:
+            client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+            client.connect(("127.0.0.1", int(server.effective_port)))
+            client.sendall(b"GET /splits HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            assert wait_until(lambda: split_server.sse_clients.value == clients + 1)
+
+            # Keep changing split without ever reading from the stream
+            index = 0
+            end = time.monotonic() + 10
+            while split_server.sse_evictions.value == evictions:
+                assert time.monotonic() < end, "Stalled client was not evicted"
+                index = 1 - index
+                poller.update(connected=True, index=index)
+                time.sleep(0.01)
+
+            # The blocked write fails and the stream finishes
+            assert wait_until(lambda: split_server.sse_clients.value == clients)
+    finally:
+        server.close()
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import socket
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from websockets.asyncio.client import connect  # noqa: E402
+from websockets.asyncio.server import serve  # noqa: E402
+
+from splitguides.server import __main__ as server_main  # noqa: E402
+from splitguides.server import split_server, websocket_server  # noqa: E402
+from splitguides.server.poller import LivesplitPoller  # noqa: E402
+
+
+@pytest.fixture(scope="function")
+def poller(server_notes, monkeypatch):
+    poller = LivesplitPoller("localhost", 16834)
+    # Don't start a polling thread, the tests set the state directly
+    monkeypatch.setattr(poller, "subscribe", lambda: None)
+    monkeypatch.setattr(poller, "unsubscribe", lambda: None)
+    poller.polled = True
+    monkeypatch.setattr(split_server, "pollers", {("localhost", 16834): poller})
+    monkeypatch.setattr(split_server, "start_notes_watcher", lambda: None)
+    for document in server_notes:
+        monkeypatch.setattr(document, "livesplit", ("localhost", 16834))
+    yield poller
+
+
+def test_client_view_messages():
+    view = websocket_server.ClientView()
+
+    view.handle_message({"type": "offset", "change": 1})
+    view.handle_message({"type": "offset", "change": 1})
+    assert view.offset == 2
+
+    view.handle_message({"type": "offset", "value": -1})
+    assert view.offset == -1
+
+    view.handle_message({"type": "window", "previous": 1, "next": 100})
+    assert (view.previous_splits, view.next_splits) == (1, split_server.MAX_WINDOW)
+
+    with pytest.raises(ValueError):
+        view.handle_message({"type": "offset", "change": "up"})
+
+
+def test_get_document(server_notes):
+    first, second = server_notes
+
+    assert websocket_server.get_document("/") is first
+    assert websocket_server.get_document("/n/route-2/") is second
+    assert websocket_server.get_document("/n/missing/") is None
+
+
+def test_initial_view():
+    view = websocket_server.get_view("/n/route/?previous=2&next=x")
+
+    assert view.previous_splits == 2
+    assert view.next_splits == split_server.settings.next_splits
+
+
+def test_notes_message(server_notes, poller):
+    first, _ = server_notes
+    view = websocket_server.ClientView()
+
+    message = websocket_server.get_notes_message(first, view, "")
+    assert not message["connected"]
+    assert message["html"] == split_server.DISCONNECTED_MESSAGE
+
+    poller.update(connected=True, index=0)
+    view.offset = 1
+    message = websocket_server.get_notes_message(first, view, "")
+    assert message["index"] == 1
+    assert message["html"] == "Second split<br>"
+
+    view.handle_message({"type": "window", "previous": 1, "next": 0})
+    message = websocket_server.get_notes_message(first, view, "")
+    assert message["html"] == "First split<br>Second split<br>"
+
+    view.handle_message({"type": "jump", "index": 0})
+    message = websocket_server.get_notes_message(first, view, "")
+    assert message["offset"] == 0
+    assert message["index"] == 0
+
+
+def test_websocket_offset(server_notes, poller):
+    poller.update(connected=True, index=0)
+
+    async def run_client():
+        async with serve(websocket_server.handle_client, "localhost", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            async with connect(f"ws://localhost:{port}/") as websocket:
+                first = json.loads(await websocket.recv())
+                await websocket.send(json.dumps({"type": "offset", "change": 1}))
+                offset = json.loads(await websocket.recv())
+                await websocket.send("not json")
+                error = json.loads(await websocket.recv())
+        return first, offset, error
+
+    first, offset, error = asyncio.run(run_client())
+
+    assert first["html"] == "First split<br>"
+    assert offset["html"] == "Second split<br>"
+    assert offset["offset"] == 1
+    assert error["type"] == "error"
+
+
+def test_start_port_in_use():
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        sock.listen()
+        port = sock.getsockname()[1]
+
+        with pytest.raises(OSError, match=f"websocket server on port {port}"):
+            websocket_server.start_websocket_server("localhost", port)
+
+
+def test_serve_disables_websockets_on_failure(server_notes, monkeypatch, capsys):
+    monkeypatch.setattr(split_server, "websocket_port", 8765)
+    monkeypatch.setattr(
+        websocket_server,
+        "start_websocket_server",
+        MagicMock(side_effect=OSError("Could not start the websocket server on port 8765")),
+    )
+
+    with patch("waitress.serve"):
+        server_main.serve()
+
+    assert split_server.websocket_port is None
+    output = capsys.readouterr().out
+    assert "websockets are disabled" in output
+    assert "Websocket connections are served" not in output
@@ -0,0 +1,105 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from splitguides import tracing
+
+
+@pytest.fixture(scope="function")
+def traced():
+    tracing.clear()
+    tracing.enable()
+    yield
+    tracing.disable()
+    tracing.clear()
+
+
+def test_disabled_span():
+    tracing.disable()
+    assert tracing.span("test") is tracing.NULL_SPAN
+
+    with tracing.span("test"):
+        pass
+
+    assert tracing.get_spans() == []
+
+
+def test_span_recorded(traced):
+    with tracing.span("test", "category"):
+        pass
+
+    spans = tracing.get_spans()
+    assert len(spans) == 1
+
+    name, category, start, duration, tid = spans[0]
+    assert (name, category) == ("test", "category")
+    assert duration >= 0
+
+
+def test_ring_buffer(traced):
+    tracing.enable(buffer_size=3)
+    try:
+        for i in range(5):
+            with tracing.span(f"span {i}"):
+                pass
+
+        assert [s[0] for s in tracing.get_spans()] == ["span 2", "span 3", "span 4"]
+    finally:
+        tracing.enable(buffer_size=tracing.DEFAULT_BUFFER_SIZE)
+
+
+def test_chrome_trace(traced, tmp_path):
+    with tracing.span("test"):
+        pass
+
+    trace_path = tmp_path / "trace.json"
+    tracing.dump_chrome_trace(trace_path)
+
+    trace = json.loads(trace_path.read_text())
+    event = trace["traceEvents"][0]
+    assert event["name"] == "test"
+    assert event["ph"] == "X"
+    assert event["pid"] == os.getpid()
+
+
+def test_counters(traced):
+    tracing.counter("page.size", "render", page=100, notes=40)
+
+    assert [c[3] for c in tracing.get_counters()] == [{"page": 100, "notes": 40}]
+
+    event = tracing.chrome_trace()["traceEvents"][0]
+    assert event["name"] == "page.size"
+    assert event["ph"] == "C"
+    assert event["args"] == {"page": 100, "notes": 40}
+
+
+def test_disabled_counter():
+    tracing.disable()
+    tracing.counter("page.size", page=100)
+
+    assert tracing.get_counters() == []
+
+
+def test_enable_from_environment(tmp_path):
+    trace_path = str(tmp_path / "trace.json")
+    with patch.dict(os.environ, {tracing.TRACE_ENV: trace_path}), \
+            patch("splitguides.tracing.atexit.register") as fake_register:
+        try:
+            assert tracing.enable_from_environment() is True
+            assert tracing.is_enabled()
+            fake_register.assert_called_once_with(tracing.dump_chrome_trace, trace_path)
+        finally:
+            tracing.disable()
+
+
+def test_notes_traced(traced):
+    from io import StringIO
+    from splitguides.note_parser import Notes, MarkdownProcessor
+
+    notes = Notes(StringIO("# Split 1"), preprocessor=MarkdownProcessor())
+    notes.render_splits(0, 1)
+
+    names = [s[0] for s in tracing.get_spans()]
+    assert names == ["notes.parse", "notes.preprocess", "notes.sanitize"]
@@ -0,0 +1,71 @@
+from unittest.mock import MagicMock
+
+from splitguides.livesplit_client import SplitEvent, SplitEventType
+from splitguides.ui.main_window import LivesplitLink
+
+
+def make_link():
+    fake_client = MagicMock()
+    fake_main_window = MagicMock()
+    fake_main_window.split_offset = 0
+    fake_main_window.settings.split_name_matching = False
+
+    link = LivesplitLink(fake_client, fake_main_window)
+    return link, fake_main_window
+
+
+def test_connected_event(qtbot):
+    link, fake_main_window = make_link()
+
+    link.handle_event(SplitEvent(SplitEventType.CONNECTED, 3))
+
+    assert link.connected is True
+    fake_main_window.update_notes.assert_called_once_with(3)
+    fake_main_window.ui.statusbar.showMessage.assert_called_with(
+        "Connected to Livesplit. | Split Offset: 0"
+    )
+
+
+def test_disconnected_event(qtbot):
+    link, fake_main_window = make_link()
+    link.connected = True
+
+    link.handle_event(SplitEvent(SplitEventType.DISCONNECTED, 3))
+
+    assert link.connected is False
+    fake_main_window.update_notes.assert_not_called()
+
+
+def test_index_coalesced(qtbot):
+    link, fake_main_window = make_link()
+
+    # Pretend a signal is already waiting to be handled
+    link.index_pending = True
+
+    link.handle_event(SplitEvent(SplitEventType.SPLIT_ADVANCED, 1))
+    link.handle_event(SplitEvent(SplitEventType.SPLIT_ADVANCED, 2))
+    fake_main_window.update_notes.assert_not_called()
+
+    # Handling the waiting signal uses the latest index
+    link.deliver_index(1)
+    fake_main_window.update_notes.assert_called_once_with(2)
+    assert link.index_pending is False
+
+
+def test_emit_on_change(qtbot):
+    link, fake_main_window = make_link()
+
+    link.handle_event(SplitEvent(SplitEventType.CONNECTED, 1))
+    link.handle_event(SplitEvent(SplitEventType.PAUSED, 1))
+    link.handle_event(SplitEvent(SplitEventType.RESUMED, 1))
+    assert link.emit_count == 1
+
+    link.handle_event(SplitEvent(SplitEventType.SPLIT_ADVANCED, 2))
+    assert link.emit_count == 2
+
+    # A changed offset is a new state
+    fake_main_window.split_offset = 1
+    link.handle_event(SplitEvent(SplitEventType.CONNECTED, 2))
+    assert link.emit_count == 3
+
+    assert fake_main_window.update_notes.call_count == 3
@@ -113,6 +113,21 @@ def test_resize_stored(qtbot, fake_link):
     assert main_window.settings.height == 1000
 
 
+def test_template_settings(qtbot, fake_link):
+    """Check the display settings are bound to the template once loaded."""
+    main_window = MainWindow()
+    qtbot.add_widget(main_window)
+
+    assert main_window.j2_environment.bytecode_cache is not None
+
+    template_globals = main_window.template.globals
+    assert template_globals["font_size"] == main_window.settings.font_size
+    assert template_globals["font_color"] == main_window.settings.font_color
+    assert template_globals["css"] == main_window.css
+
+    assert main_window.shell.can_splice
+
+
 def test_blank_notes_called(qtbot, fake_link):
     """Test the blank note message is present."""
     with patch.object(MainWindow, "render_blank") as blank_render:
@@ -144,6 +159,7 @@ def test_open_notes(qtbot, fake_link):
             patch.object(MainWindow, "update_notes") as mock_update_notes:
         main_window = MainWindow()
         qtbot.add_widget(main_window)
+        main_window.ls.connected = False
 
         fake_notes = Notes(StringIO("Fake Notes\nAre Here\n\nSplit 2"))
 
@@ -160,7 +176,7 @@ def test_open_notes(qtbot, fake_link):
             main_window,
             "Open Notes",
             original_folder,
-            "Note Files (*.txt *.md *.html);;All Files (*.*)",
+            "Note Files (*.txt *.md *.html *.sgnotes);;All Files (*.*)",
         )
 
         mock_notes.assert_called_once_with(fake_file, separator="")
@@ -171,6 +187,26 @@ def test_open_notes(qtbot, fake_link):
 # fmt: on
 
 
+# fmt: off
+def test_open_notes_connected(qtbot, fake_link):
+    """Test notes opened while connected start at the current split"""
+    with patch.object(QtWidgets.QFileDialog, "getOpenFileName") as mock_filedialog, \
+            patch.object(Notes, "from_file") as mock_notes, \
+            patch.object(MainWindow, "update_notes") as mock_update_notes:
+        main_window = MainWindow()
+        qtbot.add_widget(main_window)
+        main_window.ls.connected = True
+        main_window.ls.split_index = 4
+
+        mock_filedialog.return_value = ("fake/folder/mock_notes.txt", "Note Files (*.txt *.md *.html)")
+        mock_notes.return_value = Notes(StringIO("Fake Notes"))
+
+        main_window.open_notes()
+
+        mock_update_notes.assert_called_once_with(idx=4, refresh=True)
+# fmt: on
+
+
 # fmt: off
 def test_no_notes(qtbot, fake_link):
     """Test that notes are not read if no file is given"""
@@ -200,29 +236,26 @@ def test_update_notes(qtbot, fake_link, idx):
     main_window.settings.next_splits = 2
 
     fake_notes = MagicMock(main_window.notes)
-    fake_template = MagicMock(main_window.template)
+    fake_shell = MagicMock(main_window.shell)
     fake_note_ui = MagicMock(main_window.ui.notes)
 
     main_window.notes = fake_notes
-    main_window.template = fake_template
+    main_window.shell = fake_shell
     main_window.ui.notes = fake_note_ui
     main_window.notefile = "Notes_URL"
 
     fake_notes.render_splits.return_value = "Fake Splits"
-    fake_template.render.return_value = "Fake HTML"
+    fake_shell.render.return_value = "Fake HTML"
 
     main_window.update_notes(idx, refresh=True)
 
+    # Rendering happens on the renderer thread
+    qtbot.waitUntil(lambda: fake_note_ui.setHtml.called)
+
     used_idx = max(idx, 0)
 
     fake_notes.render_splits.assert_called_once_with(used_idx - 0, used_idx + 3)
-    fake_template.render.assert_called_once_with(
-        font_size=main_window.settings.font_size,
-        font_color=main_window.settings.font_color,
-        bg_color="transparent",
-        css=main_window.css,
-        notes="Fake Splits",
-    )
+    fake_shell.render.assert_called_once_with("Fake Splits")
 
     note_path = Path("Notes_URL").absolute().as_uri()
 
@@ -231,6 +264,71 @@ def test_update_notes(qtbot, fake_link, idx):
     assert main_window.split_index == used_idx
 
 
+def test_stale_render_discarded(qtbot, fake_link):
+    """Test a render that finishes after a newer request is not displayed"""
+    main_window = MainWindow()
+    qtbot.add_widget(main_window)
+
+    fake_note_ui = MagicMock(main_window.ui.notes)
+    main_window.ui.notes = fake_note_ui
+
+    renderer = main_window.renderer
+    old_generation = renderer.generation
+    renderer.cancel()
+
+    renderer.show_html("Old HTML", "Notes_URL", old_generation)
+    fake_note_ui.setHtml.assert_not_called()
+
+    renderer.show_html("New HTML", "Notes_URL", renderer.generation)
+    fake_note_ui.setHtml.assert_called_once_with("New HTML", baseUrl="Notes_URL")
+
+
+def test_render_requests_coalesced(qtbot, fake_link):
+    """Test requests made while a render is waiting replace the waiting request"""
+    main_window = MainWindow()
+    qtbot.add_widget(main_window)
+
+    renderer = main_window.renderer
+    fake_notes = MagicMock()
+    fake_shell = MagicMock()
+    fake_shell.render.return_value = "Fake HTML"
+
+    with patch.object(renderer, "pool") as fake_pool:
+        for i in range(5):
+            renderer.request(fake_notes, fake_shell, i, i + 3, "Notes_URL")
+
+        # Only one render loop is started
+        fake_pool.submit.assert_called_once_with(renderer.render_loop)
+        assert renderer.dropped_count == 4
+
+        renderer.render_loop()
+
+    # Only the latest request is rendered
+    fake_notes.render_splits.assert_called_once_with(4, 7)
+    assert renderer.running is False
+
+
+def test_render_assets(qtbot, fake_link):
+    """Test the asset pipeline processes rendered splits and reads ahead"""
+    main_window = MainWindow()
+    qtbot.add_widget(main_window)
+
+    renderer = main_window.renderer
+    fake_notes = MagicMock()
+    fake_notes.render_splits.return_value = ["split 1", "split 2"]
+    fake_notes.notes = ["1", "2", "3", "4", "5"]
+    fake_shell = MagicMock()
+    fake_assets = MagicMock()
+    fake_assets.process.side_effect = lambda splits: [split.upper() for split in splits]
+
+    with patch.object(renderer, "pool"):
+        renderer.request(fake_notes, fake_shell, 0, 2, "Notes_URL", assets=fake_assets)
+        renderer.render_loop()
+
+    fake_shell.render.assert_called_once_with(["SPLIT 1", "SPLIT 2"])
+    fake_assets.warm.assert_called_once_with(["3", "4"])
+
+
 # fmt: off
 def test_open_settings(qtbot, fake_link):
     fake_link_inst = MagicMock()
@@ -271,3 +369,31 @@ def test_open_settings(qtbot, fake_link):
         mock_notes.assert_called_once_with("fake_file", separator="/split")
 
 # fmt: on
+
+
+def test_find_in_notes(qtbot, fake_link):
+    """Test searching the notes moves the offset to the next matching split"""
+    with patch.object(QtWidgets.QInputDialog, "getText") as mock_input, \
+            patch.object(MainWindow, "update_notes") as mock_update_notes:
+        main_window = MainWindow()
+        qtbot.add_widget(main_window)
+        main_window.ls.connected = True
+        main_window.ls.split_index = 1
+        main_window.split_index = 1
+        main_window.notes = Notes(StringIO("Get the key\n\nSkip\n\nDoor\n\nUse the key"))
+
+        mock_input.return_value = ("key", True)
+        main_window.find_in_notes()
+
+        assert main_window.split_offset == 2
+        mock_update_notes.assert_called_with(1)
+
+        # Wraps back to the first match
+        main_window.split_index = 3
+        main_window.find_in_notes()
+        assert main_window.split_offset == -1
+
+        mock_input.return_value = ("missing", True)
+        main_window.find_in_notes()
+        assert main_window.split_offset == -1
+        assert main_window.ui.statusbar.currentMessage() == "No splits found for 'missing'"